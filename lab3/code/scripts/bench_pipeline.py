@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness of the full `lian run` pipeline.
+
+run:     analyze a corpus (e.g., one made by gen_synthetic_corpus.py) several times with `lian run --metrics`, and
+         save the total time, the peak RSS and the metrics of each phase as JSON. The phases are workspace_copy,
+         module_scan, parse, flatten, export, scope_hierarchy and the hooks of each analysis phase, e.g.,
+         control_flow.method_analysis.
+compare: compare a result with a stored baseline, and exit with 1 if any phase is slower than the tolerance.
+
+Usage:
+    python scripts/bench_pipeline.py run -l java -r 3 -o current.json corpus_dir
+    python scripts/bench_pipeline.py compare baseline.json current.json [-t 0.1]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+COMMAND_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), "src", "lian", "interfaces", "command.py")
+
+def merge_runs(runs):
+    """
+    Keep the fastest time and the largest peak RSS over the runs
+    """
+    result = {
+        "total_seconds": min(run["total_seconds"] for run in runs),
+        "peak_rss_kb": max(run["peak_rss_kb"] for run in runs),
+        "phases": {},
+    }
+    for run in runs:
+        for phase_name, metrics in run["phases"].items():
+            merged = result["phases"].get(phase_name)
+            if merged is None:
+                result["phases"][phase_name] = dict(metrics)
+                continue
+            merged["seconds"] = min(merged["seconds"], metrics["seconds"])
+            merged["peak_rss_kb"] = max(merged["peak_rss_kb"], metrics["peak_rss_kb"])
+    return result
+
+def count_units(corpus, language):
+    exts = {"java": (".java",), "typescript": (".ts",)}.get(language, ())
+    counter = 0
+    for _, _, files in os.walk(corpus):
+        for name in files:
+            if name.endswith(exts):
+                counter += 1
+    return counter
+
+def run(args):
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(args.repeat):
+            run_output = os.path.join(tmp_dir, f"run{i}.json")
+            subprocess.run([
+                sys.executable, "-W", "ignore", COMMAND_PATH, "run", "-f",
+                "-l", args.language, "-c", str(args.cores),
+                "-w", os.path.join(tmp_dir, "workspace"), "--metrics", run_output,
+                os.path.realpath(args.corpus)
+            ], stdout = subprocess.DEVNULL, check = True)
+            with open(run_output) as f:
+                runs.append(json.load(f))
+
+    result = merge_runs(runs)
+    result["corpus"] = os.path.realpath(args.corpus)
+    result["language"] = args.language
+    result["units"] = count_units(args.corpus, args.language)
+    result["cores"] = args.cores
+    result["repeat"] = args.repeat
+
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent = 4, sort_keys = True)
+    print_result(result)
+
+def print_result(result):
+    print(f"{result['units']} units, total {result['total_seconds']:.3f}s, peak RSS {result['peak_rss_kb'] // 1024}MB")
+    print(f"{'phase':>16} {'time(s)':>10} {'calls':>8} {'peak RSS(MB)':>13}")
+    for phase_name, metrics in result["phases"].items():
+        print(
+            f"{phase_name:>16} {metrics['seconds']:>10.3f} {metrics['calls']:>8} "
+            f"{metrics['peak_rss_kb'] // 1024:>13}"
+        )
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = [("total", baseline["total_seconds"], current["total_seconds"])]
+    for phase_name, metrics in baseline["phases"].items():
+        if phase_name in current["phases"]:
+            rows.append((phase_name, metrics["seconds"], current["phases"][phase_name]["seconds"]))
+
+    regressions = []
+    print(f"{'phase':>16} {'baseline(s)':>12} {'current(s)':>12} {'change':>8}")
+    for phase_name, baseline_seconds, current_seconds in rows:
+        change = 0.0
+        if baseline_seconds > 0:
+            change = current_seconds / baseline_seconds - 1
+        flag = ""
+        # ignore the phases too short to measure
+        if change > args.tolerance and current_seconds - baseline_seconds > args.min_seconds:
+            flag = " slower"
+            regressions.append(phase_name)
+        print(f"{phase_name:>16} {baseline_seconds:>12.3f} {current_seconds:>12.3f} {change:>+8.1%}{flag}")
+
+    rss_change = current["peak_rss_kb"] / max(1, baseline["peak_rss_kb"]) - 1
+    print(f"peak RSS: {baseline['peak_rss_kb'] // 1024}MB -> {current['peak_rss_kb'] // 1024}MB ({rss_change:+.1%})")
+    if regressions:
+        print("Slower phases: " + ", ".join(regressions))
+        sys.exit(1)
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    sub_parsers = arg_parser.add_subparsers(dest = "sub_command", required = True)
+
+    run_parser = sub_parsers.add_parser("run")
+    run_parser.add_argument("corpus")
+    run_parser.add_argument("-l", "--language", default = "java")
+    run_parser.add_argument("-c", "--cores", type = int, default = 1)
+    run_parser.add_argument("-r", "--repeat", type = int, default = 3)
+    run_parser.add_argument("-o", "--output", default = "bench_pipeline.json")
+
+    compare_parser = sub_parsers.add_parser("compare")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("-t", "--tolerance", type = float, default = 0.1)
+    compare_parser.add_argument("--min-seconds", type = float, default = 0.05)
+
+    args = arg_parser.parse_args()
+    if args.sub_command == "run":
+        run(args)
+    else:
+        compare(args)
+
+if __name__ == "__main__":
+    main()
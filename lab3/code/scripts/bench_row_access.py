@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-statement attribute access of dataframe_operation rows.
+
+It reads the blocks of the same rows with DataFrameAgent.read_block() and iterates them, as the semantic phase
+does with the method bodies, with the generic Row, which goes through Row.__getattr__, and with the Row class
+specialized for the schema, and reads the attributes the semantic phase reads for most statements.
+
+Usage: python scripts/bench_row_access.py [-b glang_bundle] [-n 100000] [-s 50] [-r 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "src"))
+
+import builtins
+try:
+    builtins.profile
+except AttributeError:
+    # No line profiler, provide a pass-through version
+    def profile(func): return func
+    builtins.profile = profile
+
+from lian.config import schema
+from lian.util import dataframe_operation as do
+
+def build_rows(count, block_size):
+    """
+    Build count assignments in blocks of block_size stmts
+    """
+    rows = []
+    stmt_id = 0
+    for i in range(count):
+        if i % block_size == 0:
+            if i > 0:
+                rows.append({"operation": "block_end", "stmt_id": block_id, "parent_stmt_id": 0})
+            stmt_id += 1
+            block_id = stmt_id
+            rows.append({"operation": "block_start", "stmt_id": block_id, "parent_stmt_id": 0})
+        stmt_id += 1
+        rows.append({
+            "operation": "assign_stmt",
+            "stmt_id": stmt_id,
+            "parent_stmt_id": block_id,
+            "name": f"v{i}",
+            "target": "%v0",
+            "operand": "%v1",
+            "operand2": "1",
+            "operator": "+",
+        })
+    rows.append({"operation": "block_end", "stmt_id": block_id, "parent_stmt_id": 0})
+    return do.DataFrameAgent(rows, columns = schema.glang_schema)
+
+def find_block_ids(data):
+    block_ids = []
+    for row in data:
+        if row.operation == "block_start":
+            block_ids.append(row.stmt_id)
+    return block_ids
+
+def access_all(rows):
+    for row in rows:
+        row.operation
+        row.stmt_id
+        row.parent_stmt_id
+        row.target
+        row.operand
+        row.operand2
+        row.body
+
+def bench(data, block_ids, row_class, repeat):
+    """
+    Return the best time of reading and iterating all the blocks, whose rows are row_class
+    """
+    data.refresh_schema()
+    data.refresh_rows()
+    data._row_class = row_class
+    for row in data.read_block(block_ids[0], reset_index = True):
+        if type(row) is not row_class:
+            raise TypeError("The rows of read_block() are not the row class of the data model")
+        break
+
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for block_id in block_ids:
+            access_all(data.read_block(block_id, reset_index = True))
+        used_time = time.perf_counter() - start_time
+        if best is None or used_time < best:
+            best = used_time
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-b", "--bundle", default = None)
+    arg_parser.add_argument("-n", "--rows", type = int, default = 100000)
+    arg_parser.add_argument("-s", "--block-size", type = int, default = 50)
+    arg_parser.add_argument("-r", "--repeat", type = int, default = 5)
+    args = arg_parser.parse_args()
+
+    if args.bundle:
+        data = do.DataFrameAgent().load(args.bundle)
+    else:
+        data = build_rows(args.rows, args.block_size)
+
+    data.refresh_schema()
+    block_ids = find_block_ids(data)
+    print(f"{len(block_ids)} blocks")
+    print(f"{'row class':>12} {'time(s)':>10} {'ns/attribute':>13}")
+    accesses = len(data) * 7
+    for name, row_class in (("Row", do.Row), ("specialized", do.specialize_row_class(data._schema))):
+        used_time = bench(data, block_ids, row_class, args.repeat)
+        print(f"{name:>12} {used_time:>10.3f} {used_time * 1e9 / accesses:>13.1f}")
+
+if __name__ == "__main__":
+    main()
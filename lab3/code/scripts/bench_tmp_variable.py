@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the tmp variable bookkeeping in common_parser.Parser.
+
+It replays the calls a language parser makes while walking one large file: every new node gets a %v temporary,
+some of them are synced with a previous node, and the ids are checked again later. The time per temporary should
+stay flat when the number of temporaries grows.
+
+Usage: python scripts/bench_tmp_variable.py [-s 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "src"))
+
+from lian.lang.parser import common_parser
+
+def bench(size):
+    parser = common_parser.Parser()
+    # keep the nodes alive, as the parser keys the temporaries by id(node)
+    nodes = []
+    start_time = time.perf_counter()
+    for i in range(size):
+        node = []
+        nodes.append(node)
+        parser.tmp_variable(node)
+        if i % 4 == 0 and i > 0:
+            parser.sync_tmp_variable(nodes[i - 1], node)
+        parser.check_id(node)
+        parser.have_same_id(nodes[i // 2], node)
+    return time.perf_counter() - start_time
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-s", "--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    args = arg_parser.parse_args()
+
+    print(f"{'temporaries':>12} {'time(s)':>10} {'us/temporary':>13}")
+    for size in args.sizes:
+        used_time = bench(size)
+        print(f"{size:>12} {used_time:>10.3f} {used_time * 1e6 / size:>13.2f}")
+
+if __name__ == "__main__":
+    main()
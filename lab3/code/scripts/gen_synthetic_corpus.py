@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Generator of synthetic Java and TypeScript repositories for benchmarking the lian pipeline.
+
+The same arguments and seed always give the same files. Every method declares a few locals, and its body is a mix
+of assignments, calls and nested if/while/for statements up to the given depth.
+
+Usage: python scripts/gen_synthetic_corpus.py -l java -f 200 -m 10 -s 30 -d 4 output_dir
+"""
+import argparse
+import os
+import random
+
+LANG_EXT = {
+    "java"          : ".java",
+    "typescript"    : ".ts",
+}
+
+LOCAL_COUNT = 4
+OPERATORS = ["+", "-", "*"]
+COMPARISONS = ["<", ">", "<=", ">=", "!="]
+
+class MethodGenerator:
+    def __init__(self, lang, rng, method_length, max_depth, method_count):
+        self.lang = lang
+        self.rng = rng
+        self.method_length = method_length
+        self.max_depth = max_depth
+        self.method_count = method_count
+
+    def local(self):
+        return f"v{self.rng.randrange(LOCAL_COUNT)}"
+
+    def expression(self):
+        return f"{self.local()} {self.rng.choice(OPERATORS)} {self.rng.randrange(1, 10)}"
+
+    def condition(self):
+        return f"{self.local()} {self.rng.choice(COMPARISONS)} {self.rng.randrange(100)}"
+
+    def declare(self, name, value):
+        if self.lang == "java":
+            return f"int {name} = {value};"
+        return f"let {name} = {value};"
+
+    def loop_head(self, depth):
+        index = f"i{depth}"
+        init = self.declare(index, 0)
+        return f"for ({init} {index} < {self.rng.randrange(2, 20)}; {index}++) {{"
+
+    def statement_block(self, lines, indent, depth, budget):
+        """
+        Append about budget stmts to lines, and return the number of stmts appended
+        """
+        counter = 0
+        while counter < budget:
+            choice = self.rng.random()
+            pad = "    " * indent
+            if depth < self.max_depth and choice < 0.25 and budget - counter > 2:
+                inner_budget = self.rng.randrange(1, max(2, (budget - counter) // 2))
+                kind = self.rng.randrange(3)
+                if kind == 0:
+                    lines.append(f"{pad}if ({self.condition()}) {{")
+                    counter += self.statement_block(lines, indent + 1, depth + 1, inner_budget)
+                    lines.append(f"{pad}}} else {{")
+                    counter += self.statement_block(lines, indent + 1, depth + 1, 1)
+                    lines.append(f"{pad}}}")
+                elif kind == 1:
+                    lines.append(f"{pad}while ({self.condition()}) {{")
+                    counter += self.statement_block(lines, indent + 1, depth + 1, inner_budget)
+                    lines.append(f"{pad}    {self.local()} = {self.local()} + 1;")
+                    lines.append(f"{pad}}}")
+                else:
+                    lines.append(f"{pad}{self.loop_head(depth)}")
+                    counter += self.statement_block(lines, indent + 1, depth + 1, inner_budget)
+                    lines.append(f"{pad}}}")
+                counter += 1
+            elif choice < 0.35:
+                callee = self.rng.randrange(self.method_count)
+                lines.append(f"{pad}{self.local()} = this.m{callee}({self.local()}, {self.local()});")
+                counter += 1
+            else:
+                lines.append(f"{pad}{self.local()} = {self.expression()};")
+                counter += 1
+        return counter
+
+    def method(self, index):
+        if self.lang == "java":
+            lines = [f"    public int m{index}(int a, int b) {{"]
+        else:
+            lines = [f"    m{index}(a: number, b: number): number {{"]
+        for i in range(LOCAL_COUNT):
+            lines.append("        " + self.declare(f"v{i}", "a" if i % 2 == 0 else "b"))
+        self.statement_block(lines, 2, 0, self.method_length)
+        lines.append(f"        return {self.local()};")
+        lines.append("    }")
+        return lines
+
+def generate_unit(args, rng, package_name, class_name):
+    methods = MethodGenerator(args.language, rng, args.method_length, args.depth, args.methods)
+    lines = []
+    if args.language == "java":
+        lines.append(f"package {package_name};")
+        lines.append("")
+        lines.append(f"public class {class_name} {{")
+        lines.append("    private int f0;")
+    else:
+        lines.append(f"export class {class_name} {{")
+        lines.append("    f0: number = 0;")
+    lines.append("")
+
+    for index in range(args.methods):
+        lines.extend(methods.method(index))
+        lines.append("")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def generate(args):
+    rng = random.Random(args.seed)
+    ext = LANG_EXT[args.language]
+    for file_index in range(args.files):
+        package_index = file_index // args.files_per_package
+        package_dir = os.path.join(args.output, "bench", f"p{package_index}")
+        os.makedirs(package_dir, exist_ok = True)
+
+        class_name = f"C{file_index}"
+        content = generate_unit(args, rng, f"bench.p{package_index}", class_name)
+        with open(os.path.join(package_dir, class_name + ext), "w") as f:
+            f.write(content)
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("output")
+    arg_parser.add_argument("-l", "--language", default = "java", choices = sorted(LANG_EXT))
+    arg_parser.add_argument("-f", "--files", type = int, default = 100)
+    arg_parser.add_argument("-p", "--files-per-package", type = int, default = 20)
+    arg_parser.add_argument("-m", "--methods", type = int, default = 10, help = "methods per class")
+    arg_parser.add_argument("-s", "--method-length", type = int, default = 30, help = "stmts per method")
+    arg_parser.add_argument("-d", "--depth", type = int, default = 3, help = "max nesting depth of the stmts")
+    arg_parser.add_argument("--seed", type = int, default = 0)
+    args = arg_parser.parse_args()
+    generate(args)
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@
 import os,sys
 
 DEBUG_FLAG						= False
+# record the time of each phase, unit and method in util.PHASE_METRICS, UNIT_METRICS and METHOD_METRICS
+METRICS_FLAG                    = False
 START_INDEX						= 1
 STRING_MAX_LEN                  = 200
 MAX_PRIORITY                    = 100
@@ -12,14 +14,22 @@ LANGS_SO_PATH                   = os.path.join(os.path.dirname(os.path.dirname(o
 
 DEFAULT_WORKSPACE               = "lian_workspace"
 MODULE_SYMBOLS_FILE             = "module_symbols"
+MODULE_SYMBOL_TABLE_FILE        = "module_symbol_table"
 
 SRC_DIR                       	= "src"
+# the input files and directories skipped when they are copied to SRC_DIR, or scanned in place in the reference mode
+SRC_IGNORE_PATTERNS             = [".git", "*.git*", ".*"]
+# the threads hashing the source files, which mostly wait on slow (e.g., network) file systems
+SCAN_THREADS                    = 8
+SCAN_TASKS_PER_THREAD           = 4
 GLANG_DIR                       = "glang"
 SEMANTIC_DIR					= "semantic"
 
 BIT_VECTOR_FILE  				= "bit_vector_schema"
 TYPE_TABLE_FILE                 = "type_table"
 
+UNIT_INDEX_EXT                  = ".unit_index"
+SCOPE_SPACE_EXT                 = ".scope_space"
 CONTROL_FLOW_GRAPH_EXT			= ".cfg"
 SYMBOL_DEPENDENCY_EXT           = ".sdg"
 STMT_STATUS_EXT                 = ".stmt_status"
@@ -27,8 +37,26 @@ SYMBOLS_STATES_EXT              = ".symbols_states"
 METHOD_SUMMARY_EXT              = ".method_summary"
 
 MAX_ROWS                        = 40 * 10000
+# convert the glang rows to arrow record batches unit by unit, instead of accumulating them until the bundle is saved
+STREAMING_EXPORT                = True
+# with STREAMING_EXPORT, the rows of a unit are flattened top-level stmt by top-level stmt, and converted in batches
+# of at least this many rows
+EXPORT_BATCH_ROWS               = 4096
+# None keeps the bundles uncompressed, so that the semantic phase can map them without copying. "lz4" or "zstd"
+# (set by --glang-compression) makes them several times smaller, and they are decompressed when they are read.
+GLANG_BUNDLE_COMPRESSION        = None
 MAX_BENCHMARK_TARGET	   		= 10_000
 MAX_STMT_STATE_ANALYIS_ROUND	= 6
 
 LRU_CACHE_CAPACITY              = 100
+BIT_VECTOR_NUMPY_DECODE_WIDTH   = 256
+
+PARSE_TASKS_PER_CORE            = 4
+# the source files of at least this size are mapped instead of read for tree-sitter
+SOURCE_MMAP_MIN_SIZE            = 1 << 20
+# the chunk size of the UTF-8 check of the source files
+SOURCE_CHECK_CHUNK_SIZE         = 1 << 20
+# the encoding of the source files which are not UTF-8, converted to UTF-8 before parsing
+SOURCE_FALLBACK_ENCODING        = "latin-1"
+METHOD_TASKS_PER_CORE           = 4
 
@@ -13,6 +13,7 @@ module_symbol_table_schema = {
     "unit_ext"                     	: "",
     "lang"                          : "",
     "unit_path"                     : "",
+    "unit_hash"                     : "",
     "glang_path"                    : "",
     "scope_space_path"				: "",
     "control_flow_graph_path"       : "",
@@ -73,6 +74,51 @@ glang_schema = [
     "unit_id"
 ]
 
+# the glang columns of integers: ids and the block ids assigned by GLangProcess.flatten_block()
+glang_int_fields = [
+    "stmt_id",
+    "parent_stmt_id",
+    "unit_id",
+    "init",
+    "static_init",
+    "fields",
+    "methods",
+    "nested",
+    "parameters",
+    "body",
+    "init_body",
+    "then_body",
+    "else_body",
+    "condition_prebody",
+    "update_body",
+    "catch_body",
+    "final_body",
+]
+
+# the glang columns of short repeated strings, which are dictionary-encoded
+glang_dictionary_fields = [
+    "operation",
+    "name",
+    "data_type",
+    "type_parameters",
+    "return_type",
+    "operator",
+    "field",
+]
+
+# the glang columns of lists of strings
+glang_list_fields = [
+    "attr",
+    "supers",
+    "args",
+]
+
+unit_index_schema = {
+    "unit_id"                       : 0,
+    "start_row"                     : 0,
+    "end_row"                       : 0,
+}
+
 scope_space_schema = [
     "unit_id",
     "stmt_id",
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from lian.config import config, constants
+from lian.lang import storage
+from lian.util import util
+from lian.util import dataframe_operation as do
+
+SymbolKind = constants.SymbolKind
+
+SEMANTIC_EXTS = [
+    config.SCOPE_SPACE_EXT,
+    config.CONTROL_FLOW_GRAPH_EXT,
+    config.SYMBOL_DEPENDENCY_EXT,
+    config.STMT_STATUS_EXT,
+    config.SYMBOLS_STATES_EXT,
+]
+
+class IncrementalAnalysis:
+    """
+    Reuse the results of the last run in the workspace.
+
+    A unit is reused if its path and its unit_hash are the same as the last run, which is only hashed when it is
+    incremental too. The rows of the other units are
+    removed from the existing glang bundles and the semantic files, and those units are parsed and analyzed again
+    into new bundles, whose stmt_ids start after the largest stmt_id of the existing bundles.
+    """
+    def __init__(self, options, module_symbols):
+        self.options = options
+        self.module_symbols = module_symbols
+        self.module_symbol_table = module_symbols.module_symbol_table
+
+        self.glang_dir = os.path.join(options.workspace, config.GLANG_DIR)
+        self.semantic_dir = os.path.join(options.workspace, config.SEMANTIC_DIR)
+
+        # old unit_id -> new unit_id
+        self.reused_unit_ids = {}
+        # new unit_id -> bundle name
+        self.unit_id_to_bundle = {}
+        self.changed_unit_ids = set()
+        self.max_stmt_id = 0
+        self.max_bundle_count = -1
+
+    def unit_key(self, unit_path):
+        return os.path.relpath(os.path.realpath(unit_path), os.path.realpath(self.options.workspace))
+
+    def load_previous_symbols(self):
+        path = os.path.join(self.options.workspace, config.MODULE_SYMBOL_TABLE_FILE)
+        if not os.path.exists(path):
+            return None
+        previous_symbols = do.DataFrameAgent().load(path)
+        if "unit_hash" not in previous_symbols._data.columns or previous_symbols._data["unit_hash"].isna().all():
+            util.debug("Incremental mode: the last run was not incremental, so its units were not hashed")
+            return None
+        return previous_symbols
+
+    def compare_units(self, previous_symbols):
+        previous_units = {}
+        for row in previous_symbols.query(previous_symbols.symbol_type == SymbolKind.UNIT_SYMBOL):
+            if util.isna(row.unit_hash) or util.isna(row.glang_path):
+                continue
+            previous_units[self.unit_key(row.unit_path)] = row
+
+        symbol_table = self.module_symbol_table
+        current_units = symbol_table.query(
+            (symbol_table.symbol_type == SymbolKind.UNIT_SYMBOL)
+            & (symbol_table.unit_ext.isin(self.options.language_extensions))
+        )
+        for row in current_units:
+            previous = previous_units.get(self.unit_key(row.unit_path))
+            if previous is not None and previous.unit_hash == row.unit_hash:
+                self.reused_unit_ids[previous.symbol_id] = row.symbol_id
+                self.unit_id_to_bundle[row.symbol_id] = os.path.basename(previous.glang_path)
+            else:
+                self.changed_unit_ids.add(row.symbol_id)
+
+    def splice_file(self, path):
+        data_model = do.DataFrameAgent().load(path)
+        if data_model.is_empty():
+            return data_model
+
+        data_model = data_model.query(data_model.unit_id.isin(list(self.reused_unit_ids)))
+        data_model.modify_column("unit_id", data_model.unit_id.map(self.reused_unit_ids).values)
+
+        if data_model.is_empty():
+            os.remove(path)
+        else:
+            data_model.save(path)
+        return data_model
+
+    def splice_bundle(self, bundle_path):
+        """
+        Keep the rows of the reused units in the glang bundle, and record the largest stmt_id of them. The bundle
+        is filtered as an arrow table, and written with its own column types and the options of the Exporter.
+        """
+        with pa.OSFile(bundle_path, "rb") as source:
+            bundle = pa.ipc.open_file(source).read_all()
+
+        old_unit_ids = pa.array(list(self.reused_unit_ids), type = pa.int64())
+        new_unit_ids = pa.array(list(self.reused_unit_ids.values()), type = pa.int64())
+        bundle = bundle.filter(pc.is_in(bundle.column("unit_id"), value_set = old_unit_ids))
+        if bundle.num_rows == 0:
+            os.remove(bundle_path)
+            return bundle
+
+        unit_id_index = bundle.schema.get_field_index("unit_id")
+        unit_id_field = bundle.schema.field(unit_id_index)
+        unit_ids = pc.take(new_unit_ids, pc.index_in(bundle.column("unit_id"), value_set = old_unit_ids))
+        bundle = bundle.set_column(unit_id_index, unit_id_field, unit_ids.cast(unit_id_field.type))
+        self.max_stmt_id = max(self.max_stmt_id, pc.max(bundle.column("stmt_id")).as_py())
+
+        spliced_path = bundle_path + ".spliced"
+        with pa.ipc.new_file(spliced_path, bundle.schema, options = storage.glang_write_options()) as writer:
+            writer.write_table(bundle)
+        os.replace(spliced_path, bundle_path)
+        return bundle
+
+    def splice_bundles(self):
+        for bundle_name in sorted(os.listdir(self.glang_dir)):
+            if not bundle_name.startswith("glang_bundle") or config.UNIT_INDEX_EXT in bundle_name:
+                continue
+            self.max_bundle_count = max(self.max_bundle_count, int(bundle_name[len("glang_bundle"):]))
+
+            bundle_path = os.path.join(self.glang_dir, bundle_name)
+            bundle = self.splice_bundle(bundle_path)
+            unit_index_path = bundle_path + config.UNIT_INDEX_EXT
+            if bundle.num_rows == 0:
+                if os.path.exists(unit_index_path):
+                    os.remove(unit_index_path)
+            else:
+                storage.save_unit_index(storage.build_unit_index(bundle.column("unit_id").to_numpy()), bundle_path)
+            for ext in SEMANTIC_EXTS:
+                semantic_path = os.path.join(self.semantic_dir, bundle_name + ext)
+                if bundle.num_rows == 0:
+                    if os.path.exists(semantic_path):
+                        os.remove(semantic_path)
+                elif os.path.exists(semantic_path):
+                    self.splice_file(semantic_path)
+
+            if bundle.num_rows > 0:
+                self.module_symbols.reused_glang_paths.add(bundle_path)
+
+    def update_reused_paths(self):
+        for unit_id, bundle_name in self.unit_id_to_bundle.items():
+            unit_info = self.module_symbols.find_unit_by_id(unit_id)
+            self.module_symbols.update_glang_path(unit_info, os.path.join(self.glang_dir, bundle_name))
+
+        for bundle_path in self.module_symbols.reused_glang_paths:
+            semantic_path = os.path.join(self.semantic_dir, os.path.basename(bundle_path))
+            self.module_symbols.update_scope_space_path_by_glang_path(
+                bundle_path, semantic_path + config.SCOPE_SPACE_EXT
+            )
+            self.module_symbols.update_cfg_path_by_glang_path(
+                bundle_path, semantic_path + config.CONTROL_FLOW_GRAPH_EXT
+            )
+            self.module_symbols.update_sdg_path_by_glang_path(
+                bundle_path, semantic_path + config.SYMBOL_DEPENDENCY_EXT
+            )
+            self.module_symbols.update_stmt_status_path_by_glang_path(
+                bundle_path, semantic_path + config.STMT_STATUS_EXT
+            )
+            self.module_symbols.update_symbols_states_path_by_glang_path(
+                bundle_path, semantic_path + config.SYMBOLS_STATES_EXT
+            )
+
+    def next_stmt_id(self):
+        return (self.max_stmt_id // config.MIN_ID_INTERVAL + 1) * config.MIN_ID_INTERVAL
+
+    def next_bundle_count(self):
+        return self.max_bundle_count + 1
+
+    def run(self):
+        previous_symbols = self.load_previous_symbols()
+        if previous_symbols is None:
+            util.debug("Incremental mode: no previous results are found, all units will be analyzed")
+            return False
+
+        self.compare_units(previous_symbols)
+        self.splice_bundles()
+        self.update_reused_paths()
+        self.module_symbols.apply_path_updates()
+
+        self.module_symbols.changed_unit_ids = self.changed_unit_ids
+        self.module_symbols.start_stmt_id = self.next_stmt_id()
+        self.module_symbols.start_bundle_count = self.next_bundle_count()
+        util.debug(
+            f"Incremental mode: {len(self.reused_unit_ids)} units reused, {len(self.changed_unit_ids)} units changed"
+        )
+        return True
+
+def reuse_previous_results(options, module_symbols):
+    return IncrementalAnalysis(options, module_symbols).run()
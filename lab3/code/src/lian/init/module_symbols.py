@@ -1,15 +1,27 @@
 #!/usr/bin/env python3
 
+import fnmatch
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 
 from lian.config import schema, constants, config
 from lian.util import dataframe_operation as do
+from lian.util import util
 
 SymbolKind = constants.SymbolKind
 EXTENSIONS_LANG = constants.EXTENSIONS_LANG
 
+# the columns of module_symbol_table filled by scan_modules(), where the unit columns are None for modules
+MODULE_COLUMNS = ["symbol_id", "symbol_name", "parent_symbol_id", "symbol_type"]
+UNIT_COLUMNS = ["unit_ext", "lang", "unit_path", "unit_hash"]
+IGNORED_NAME = re.compile("|".join(fnmatch.translate(pattern) for pattern in config.SRC_IGNORE_PATTERNS))
+
+def hash_files(paths):
+    return [util.file_md5(path) for path in paths]
+
 class PathManager:
     def __init__(self, a):
         self.index_id = config.START_INDEX
@@ -38,22 +50,40 @@ class PathManager:
 class ModuleSymbols:
     def __init__(self, options):
         self.global_symbol_id = config.START_INDEX
-        self.module_symbol_results = []
+        # column name -> values, filled by scan_modules()
+        self.module_symbol_columns = self.new_module_symbol_columns()
 
         self.options = options
         self.module_symbol_table = None
+        self.symbol_id_to_index = None
+
+        # incremental mode: the units to be analyzed again (None means all), the bundles reused from the last run,
+        # and where the ids of the new stmts and bundles start
+        self.changed_unit_ids = None
+        self.reused_glang_paths = set()
+        self.start_stmt_id = None
+        self.start_bundle_count = 0
+
+        # the path updates are buffered, and applied to module_symbol_table by apply_path_updates() at the end of
+        # each phase: row index -> glang_path, and column -> {glang_path: path}
+        self.pending_glang_paths = {}
+        self.pending_paths_by_glang_path = {}
+
+    def new_module_symbol_columns(self):
+        columns = {}
+        for column_name in MODULE_COLUMNS + UNIT_COLUMNS:
+            columns[column_name] = []
+        return columns
 
     def save_results(self):
-        self.module_symbol_table = do.DataFrameAgent(
-            # self.module_symbol_results, columns=schema.module_symbol_table_schema
-            self.module_symbol_results
-        )
+        self.module_symbol_table = do.DataFrameAgent(self.module_symbol_columns)
 
-        del self.module_symbol_results
-        self.module_symbol_results = []
+        self.module_symbol_columns = self.new_module_symbol_columns()
+        self.symbol_id_to_index = None
 
     def export(self):
-        path = os.path.join(self.options.workspace, "module_symbol_table")
+        self.apply_path_updates()
+        path = os.path.join(self.options.workspace, config.MODULE_SYMBOL_TABLE_FILE)
         self.module_symbol_table.save(path)
 
     def generate_symbol_id(self):
@@ -62,82 +92,183 @@ class ModuleSymbols:
         return result
 
     def find_unit_by_id(self, unit_id):
-        self.module_symbol_table.symbol_id
-        return self.module_symbol_table.query_first(
-            self.module_symbol_table.symbol_id == unit_id
-        )
+        if self.symbol_id_to_index is None:
+            self.symbol_id_to_index = {}
+            symbol_ids = self.module_symbol_table.symbol_id.values
+            for index in range(len(symbol_ids)):
+                self.symbol_id_to_index[symbol_ids[index]] = index
+
+        index = self.symbol_id_to_index.get(unit_id)
+        if index is None:
+            return None
+        return self.module_symbol_table.access(index)
+
+    def add_module_symbol(self, module_name, parent_module_id):
+        module_id = self.generate_symbol_id()
+        columns = self.module_symbol_columns
+        columns["symbol_id"].append(module_id)
+        columns["symbol_name"].append(module_name)
+        columns["parent_symbol_id"].append(parent_module_id)
+        columns["symbol_type"].append(SymbolKind.MODULE_SYMBOL)
+        for column_name in UNIT_COLUMNS:
+            columns[column_name].append(None)
+        return module_id
+
+    def add_unit_symbol(self, unit_name, unit_ext, unit_path, parent_module_id):
+        """
+        The hash of the unit is filled by hash_units() after the scan in the incremental mode
+        """
+        unit_id = self.generate_symbol_id()
+        columns = self.module_symbol_columns
+        columns["symbol_id"].append(unit_id)
+        columns["symbol_name"].append(unit_name)
+        columns["parent_symbol_id"].append(parent_module_id)
+        columns["symbol_type"].append(SymbolKind.UNIT_SYMBOL)
+        columns["unit_ext"].append(unit_ext)
+        columns["lang"].append(EXTENSIONS_LANG.get(unit_ext))
+        columns["unit_path"].append(unit_path)
+        columns["unit_hash"].append(None)
+        return unit_id
 
     def scan_modules(self, module_path=None, parent_module_id=-1):
+        """
+        Walk the modules with a stack of directory iterators, in the same order as a recursive walk. Only the
+        files with the target extensions become units, and the names matching config.SRC_IGNORE_PATTERNS are
+        skipped.
+        """
         if module_path is None:
-            module_path = os.path.join(self.options.workspace, "src")
+            if self.options.reference:
+                self.scan_input_paths()
+                return
+            module_path = os.path.join(self.options.workspace, config.SRC_DIR)
+
+        extensions = set(self.options.language_extensions)
+        stack = [(os.scandir(module_path), parent_module_id)]
+        while stack:
+            entries, module_id = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                entries.close()
+                stack.pop()
+                continue
+
+            if IGNORED_NAME.match(entry.name):
+                continue
 
-        # Only scan current directory, _not_ recursively
-        for entry in os.scandir(module_path):
             # 1. scan all folders and build the module-level symbols
             if entry.is_dir():
-                module_id = self.generate_symbol_id()
-                self.module_symbol_results.append({
-                    "symbol_id": module_id,
-                    "symbol_name": entry.name,
-                    "parent_symbol_id": parent_module_id,
-                    "symbol_type": SymbolKind.MODULE_SYMBOL
-                })
-
-                self.scan_modules(entry.path, module_id)
-
-            # 2. scan each .gl file, and extract the unit-level symbols
-            # TODO How to find the target files
+                child_module_id = self.add_module_symbol(entry.name, module_id)
+                stack.append((os.scandir(entry.path), child_module_id))
+
+            # 2. scan the files of the target languages, and extract the unit-level symbols
             elif entry.is_file():
-                unit_id = self.generate_symbol_id()
                 unit_name, unit_ext = os.path.splitext(entry.name)
-                self.module_symbol_results.append({
-                    "symbol_id": unit_id,
-                    "symbol_name": unit_name,
-                    "unit_ext": unit_ext,
-                    "lang": EXTENSIONS_LANG.get(unit_ext),
-                    "unit_path": entry.path,
-                    "parent_symbol_id": parent_module_id,
-                    "symbol_type": SymbolKind.UNIT_SYMBOL
-                })
+                if unit_ext in extensions:
+                    self.add_unit_symbol(unit_name, unit_ext, entry.path, module_id)
+
+    def scan_input_paths(self):
+        """
+        Reference mode: scan the input paths in place, with the same modules as the ones copied to the workspace,
+        so that unit_path is the path of the original file
+        """
+        for package_path in self.options.input:
+            if not os.path.exists(package_path):
+                util.debug(f"Package not found: {package_path}")
+                continue
+
+            package_path = os.path.abspath(package_path)
+            if os.path.isfile(package_path):
+                unit_name, unit_ext = os.path.splitext(os.path.basename(package_path))
+                if unit_ext in self.options.language_extensions:
+                    self.add_unit_symbol(unit_name, unit_ext, package_path, -1)
+            elif os.path.isdir(package_path):
+                module_id = self.add_module_symbol(os.path.basename(package_path), -1)
+                self.scan_modules(package_path, module_id)
+
+    def hash_units(self):
+        """
+        Hash the units with a thread pool, as the reads mostly wait on the file system. The units are split into a
+        few chunks per thread, since a task per file costs more than hashing a small file.
+        """
+        unit_paths = self.module_symbol_columns["unit_path"]
+        indexes = [index for index in range(len(unit_paths)) if unit_paths[index] is not None]
+        if len(indexes) == 0:
+            return
+
+        chunk_size = max(1, len(indexes) // (config.SCAN_THREADS * config.SCAN_TASKS_PER_THREAD))
+        chunks = []
+        for start in range(0, len(indexes), chunk_size):
+            chunks.append([unit_paths[index] for index in indexes[start:start + chunk_size]])
+
+        unit_hashes = self.module_symbol_columns["unit_hash"]
+        counter = 0
+        with ThreadPoolExecutor(config.SCAN_THREADS) as executor:
+            for chunk_hashes in executor.map(hash_files, chunks):
+                for unit_hash in chunk_hashes:
+                    unit_hashes[indexes[counter]] = unit_hash
+                    counter += 1
 
     def update_glang_path(self, unit_info, glang_path):
-        self.module_symbol_table.modify_element(
-            unit_info.get_index(), "glang_path", glang_path)
+        self.pending_glang_paths[unit_info.get_index()] = glang_path
+
+    def update_path_by_glang_path(self, column_name, glang_path, path):
+        self.pending_paths_by_glang_path.setdefault(column_name, {})[glang_path] = path
 
     def update_cfg_path_by_glang_path(self, glang_path, cfg_path):
-        satisfied = self.module_symbol_table.query(self.module_symbol_table.glang_path == glang_path)
-        for index in satisfied._data.index:
-            self.module_symbol_table.modify_element(index, "control_flow_graph_path", cfg_path)
+        self.update_path_by_glang_path("control_flow_graph_path", glang_path, cfg_path)
 
     def update_sdg_path_by_glang_path(self, glang_path, sdg_path):
-        satisfied = self.module_symbol_table.query(self.module_symbol_table.glang_path == glang_path)
-        for index in satisfied._data.index:
-            self.module_symbol_table.modify_element(index, "symbol_dependency_graph_path", sdg_path)
+        self.update_path_by_glang_path("symbol_dependency_graph_path", glang_path, sdg_path)
 
     def update_scope_space_path_by_glang_path(self, glang_path, scope_space_path):
-        satisfied = self.module_symbol_table.query(self.module_symbol_table.glang_path == glang_path)
-        for index in satisfied._data.index:
-            self.module_symbol_table.modify_element(index, "scope_space_path", scope_space_path)
+        self.update_path_by_glang_path("scope_space_path", glang_path, scope_space_path)
 
     def update_stmt_status_path_by_glang_path(self, glang_path, stmt_status_path):
-        satisfied = self.module_symbol_table.query(self.module_symbol_table.glang_path == glang_path)
-        for index in satisfied._data.index:
-            self.module_symbol_table.modify_element(index, "stmt_status_path", stmt_status_path)
+        self.update_path_by_glang_path("stmt_status_path", glang_path, stmt_status_path)
 
     def update_symbols_states_path_by_glang_path(self, glang_path, symbols_states_path):
-        satisfied = self.module_symbol_table.query(self.module_symbol_table.glang_path == glang_path)
-        for index in satisfied._data.index:
-            self.module_symbol_table.modify_element(index, "symbols_states_path", symbols_states_path)
-    
+        self.update_path_by_glang_path("symbols_states_path", glang_path, symbols_states_path)
+
     def update_method_summary_path_by_glang_path(self, glang_path, method_summary_path):
-        satisfied = self.module_symbol_table.query(self.module_symbol_table.glang_path == glang_path)
-        for index in satisfied._data.index:
-            self.module_symbol_table.modify_element(index, "method_summary_path", method_summary_path)
+        self.update_path_by_glang_path("method_summary_path", glang_path, method_summary_path)
+
+    def take_path_updates(self):
+        """
+        Return and clear the buffered updates by glang_path, which are sent back from the worker processes
+        """
+        path_updates = self.pending_paths_by_glang_path
+        self.pending_paths_by_glang_path = {}
+        return path_updates
+
+    def merge_path_updates(self, path_updates):
+        for column_name, glang_path_to_path in path_updates.items():
+            for glang_path, path in glang_path_to_path.items():
+                self.update_path_by_glang_path(column_name, glang_path, path)
+
+    def apply_path_updates(self):
+        """
+        Write the buffered path updates into module_symbol_table, one vectorized assignment per column
+        """
+        if len(self.pending_glang_paths) > 0:
+            glang_paths = pd.Series(self.pending_glang_paths, dtype = object)
+            self.module_symbol_table.modify_elements(glang_paths.index, "glang_path", glang_paths)
+            self.pending_glang_paths = {}
 
+        if len(self.pending_paths_by_glang_path) > 0 and "glang_path" in self.module_symbol_table._data.columns:
+            glang_paths = self.module_symbol_table._data["glang_path"]
+            for column_name, glang_path_to_path in self.pending_paths_by_glang_path.items():
+                paths = glang_paths.map(glang_path_to_path)
+                satisfied = paths.notna()
+                if satisfied.any():
+                    self.module_symbol_table.modify_elements(satisfied, column_name, paths[satisfied])
+        self.pending_paths_by_glang_path = {}
 
 def build_module_symbols(options):
     ss = ModuleSymbols(options)
     ss.scan_modules()
+    # only the incremental mode compares the hashes, which read every unit once more
+    if options.incremental:
+        ss.hash_units()
     ss.save_results()
 
     return ss
@@ -9,6 +9,20 @@ from lian.config import constants, config
 LANG_EXTENSIONS = constants.LANG_EXTENSIONS
 EXTENSIONS_LANG = constants.EXTENSIONS_LANG
 
+def clean_directory(path):
+    if not os.path.exists(path):
+        return
+
+    for filename in os.listdir(path):
+        file_path = os.path.join(path, filename)
+        try:
+            if os.path.isfile(file_path) or os.path.islink(file_path):
+                os.unlink(file_path)
+            elif os.path.isdir(file_path):
+                shutil.rmtree(file_path)
+        except Exception as e:
+            util.error_and_quit(f"Failed to delete {file_path}. Reason: {e}")
+
 def manage_directory(options, path):
     if not os.path.exists(path):
         os.makedirs(path)
@@ -16,31 +30,35 @@ def manage_directory(options, path):
             util.debug(f"Directory created at: {path}")
         return
 
+    if options.incremental:
+        # keep the results of the last run, and only refresh the copied source code
+        if config.DEBUG_FLAG:
+            util.debug(f"With the incremental mode flag, the workspace is being reused: {path}")
+        clean_directory(os.path.join(path, config.SRC_DIR))
+        return
+
     if not options.force:
         util.error_and_quit(f"The target directory already exists: {path}")
     
     if config.DEBUG_FLAG:                    
         util.warn(f"With the force mode flag, the workspace is being rewritten: {path}")
     
-    for filename in os.listdir(path):
-        file_path = os.path.join(path, filename)
-        try:
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)
-        except Exception as e:
-            util.error_and_quit(f"Failed to delete {file_path}. Reason: {e}")
-                
+    clean_directory(path)
+
 
 def build_workspace(options):
     workspace_path = options.workspace
     manage_directory(options, workspace_path)
     
     subdirs = [config.SRC_DIR, config.GLANG_DIR, config.SEMANTIC_DIR]
+    if options.reference:
+        # the input paths are scanned in place, and the workspace only stores the derived results
+        subdirs.remove(config.SRC_DIR)
     for subdir in subdirs:
         subdir_path = os.path.join(workspace_path, subdir)
         os.makedirs(subdir_path, exist_ok=True)
+    if options.reference:
+        return
 
     src_dir_path = os.path.join(workspace_path, 'src')
     for package_path in options.input:
@@ -53,11 +71,12 @@ def build_workspace(options):
                     shutil.copy(package_path, src_dir_path)
             elif os.path.isdir(package_path):
                 try:
-                    shutil.copytree(package_path, dest_path, ignore=shutil.ignore_patterns('.git', '*.git*', '.*'), dirs_exist_ok=True)
+                    shutil.copytree(package_path, dest_path, ignore=shutil.ignore_patterns(*config.SRC_IGNORE_PATTERNS), dirs_exist_ok=True)
                 except shutil.Error as e:
                     util.error(f"Fail to copy directory {package_path} to {dest_path}: {e}")
         else:
             util.debug(f"Package not found: {package_path}")
 
 def setup(options):
-    build_workspace(options)
+    with util.measure_phase("workspace_copy"):
+        build_workspace(options)
@@ -30,6 +30,9 @@ class Options:
         apps (list): List of application instances.
         sub_command (str): Current sub-command of the program.
         language (str): Language code for the program.
+        reference (bool): Flag indicating whether to analyze the input files in place instead of copying them to the workspace.
+        metrics (str): Path of the JSON file to write the time of each phase, unit and method to.
+        glang_compression (str): Compression of the glang bundles, "lz4" or "zstd", or "" to keep them uncompressed.
 
     Methods:
         __post_init__(): Initializes the attributes of the Options class instance.
@@ -47,6 +50,8 @@ class Options:
     workspace: str = ""
     debug: bool = False
     force: bool = False
+    incremental: bool = False
+    reference: bool = False
     benchmark: bool = False
     print_stmts: bool = False
     cores: int = None
@@ -54,6 +59,8 @@ class Options:
     apps: list = field(default_factory=list)
     sub_command: str = ""
     language: str = ""
+    metrics: str = ""
+    glang_compression: str = ""
 
     def __post_init__(self):
         self.__apps()
@@ -137,12 +144,16 @@ def parse_args(input_source=None) -> Options:
         parser.add_argument('input', nargs='+', type=str, help='the input')
         parser.add_argument('-w', "--workspace", default=config.DEFAULT_WORKSPACE, type=str, help='the workspace directory (default:lian_workspace)')
         parser.add_argument("-f", "--force", action="store_true", help="Enable the FORCE mode for rewritting the workspace directory")
+        parser.add_argument("-i", "--incremental", action="store_true", help="Only analyze the files changed since the last incremental run in the workspace")
+        parser.add_argument("--reference", action="store_true", help="Analyze the input files in place instead of copying them to the workspace")
         parser.add_argument("-d", "--debug", action="store_true", help="Enable the DEBUG mode")
         parser.add_argument("-p", "--print_stmts", action="store_true", help="Print statements")
-        parser.add_argument("-c", "--cores", default=1, help="Configure the available CPU cores")
+        parser.add_argument("-c", "--cores", default=1, type=int, help="Configure the available CPU cores (the semantic phase uses one core in the DEBUG mode)")
         parser.add_argument("--android", action="store_true", help="Enable the Android analysis mode")
         parser.add_argument("-a", "--apps", default=[], action='append', help="Config the <plugin> dir")
         parser.add_argument('-l', "--language", default="", type=str, help='programming language')
+        parser.add_argument("--metrics", default="", type=str, help="Write the time of each phase, unit and method to the given JSON file")
+        parser.add_argument("--glang-compression", default="", choices=["", "lz4", "zstd"], help="Compress the glang bundles, which are then decompressed instead of mapped by the semantic phase")
 
     if input_source:
         return Options(**vars(main_parser.parse_args(input_source)))
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os
 import sys
+import time
 
 import builtins
 try:
@@ -18,7 +19,7 @@ sys.path.append(os.path.realpath(os.path.dirname(os.path.dirname(os.path.dirname
 
 from lian.interfaces.args_parser import Options, parse_args
 from lian.interfaces import lang, semantic
-from lian.init import prepare, module_symbols
+from lian.init import prepare, module_symbols, incremental
 from lian.config import config, constants
 from lian.util import util
 
@@ -44,22 +45,30 @@ class Lian:
 
     # app path -> options -> app_manager -> load app from the path (importlib) -> register app
     def run(self):
+        start_time = time.perf_counter()
         options = parse_args()
         options = self.adjust_options(options)
 
         config.DEBUG_FLAG = options.debug
+        config.METRICS_FLAG = bool(options.metrics)
+        config.GLANG_BUNDLE_COMPRESSION = options.glang_compression or None
         if options.debug:
             util.debug(options)
 
         prepare.setup(options)
-        init_module_symbols = module_symbols.build_module_symbols(options)
-        print(init_module_symbols)
+        with util.measure_phase("module_scan"):
+            init_module_symbols = module_symbols.build_module_symbols(options)
         if init_module_symbols.module_symbol_table.is_empty():
             util.error_and_quit("No target file found.")
+        if options.incremental:
+            incremental.reuse_previous_results(options, init_module_symbols)
         handler = self.command_handler.get(options.sub_command)
         if handler:
             handler(options, init_module_symbols)
 
+        if options.metrics:
+            util.save_metrics(options.metrics, time.perf_counter() - start_time)
+
     def lang_command(self, options: Options, init_module_symbols):
         lang.run(options, init_module_symbols)
 
@@ -68,7 +77,6 @@ class Lian:
 
     def run_command(self, options, init_module_symbols):
         self.lang_command(options, init_module_symbols)
-        print(9999999999999999999999999999999)
         self.semantic_command(options, init_module_symbols)
 
 def main():
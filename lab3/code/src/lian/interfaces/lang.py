@@ -3,6 +3,8 @@
 # system modules
 import os
 import pprint
+import time
+from multiprocessing import Pool
 
 # sys.setrecursionlimit(10000)
 from lian.config import config, constants
@@ -13,26 +15,90 @@ def init_start_stmt_id(symbol_table):
     init_len = (len(symbol_table) + 10) // 10 * 10
     return init_len
 
+worker_options = None
+
+def init_worker(options):
+    global worker_options
+    worker_options = options
+    config.DEBUG_FLAG = options.debug
+    config.METRICS_FLAG = bool(options.metrics)
+    # drop the metrics copied from the parent process
+    util.take_metrics()
+
+def parse_worker(unit_path):
+    start_time = time.perf_counter()
+    parsed_unit = glang_parser.parse_file_unit(unit_path, worker_options)
+    return (parsed_unit, time.perf_counter() - start_time, util.take_metrics())
+
+def run_serial(options, all_units, current_node_id, exporter):
+    # the whole glang IR of each unit is kept only to be printed
+    streaming = exporter.streaming and not (options.debug and options.print_stmts)
+    for row in all_units:
+        # if row.symbol_type == constants.SymbolKind.UNIT_SYMBOL and row.unit_ext in extensions:
+        start_time = time.perf_counter()
+        if streaming:
+            current_node_id = glang_parser.stream_file_unit(current_node_id, row.unit_path, row, options, exporter)
+            util.add_unit_metrics(
+                row.symbol_id, {"path": row.unit_path, "lang_seconds": time.perf_counter() - start_time}
+            )
+            continue
+
+        current_node_id, glang_ir = glang_parser.deal_with_file_unit(
+            current_node_id, row.unit_path, options
+        )
+        util.add_unit_metrics(row.symbol_id, {"path": row.unit_path, "lang_seconds": time.perf_counter() - start_time})
+        exporter.add_data(glang_ir, row)
+
+def run_parallel(options, all_units, current_node_id, exporter):
+    """
+    Units are parsed and flattened by the workers, and then placed at their stmt_id ranges in the original order,
+    so that the bundles are the same as the ones of run_serial()
+    """
+    unit_rows = []
+    unit_paths = []
+    for row in all_units:
+        unit_rows.append(row)
+        unit_paths.append(row.unit_path)
+
+    chunksize = max(1, len(unit_paths) // (options.cores * config.PARSE_TASKS_PER_CORE))
+    with Pool(options.cores, initializer = init_worker, initargs = (options,)) as pool:
+        counter = 0
+        for parsed_unit, used_time, metrics in pool.imap(parse_worker, unit_paths, chunksize):
+            row = unit_rows[counter]
+            util.merge_metrics(metrics)
+            util.add_unit_metrics(row.symbol_id, {"path": row.unit_path, "lang_seconds": used_time})
+            current_node_id, glang_ir = glang_parser.place_file_unit(current_node_id, parsed_unit)
+            exporter.add_data(glang_ir, row)
+            counter += 1
+
 def run(options, module_symbols):
     symbol_table = module_symbols.module_symbol_table
     all_units = symbol_table.query(
             (symbol_table.symbol_type == constants.SymbolKind.UNIT_SYMBOL)
             & (symbol_table.unit_ext.isin(options.language_extensions))
     )
+    if module_symbols.changed_unit_ids is not None:
+        all_units = all_units.query(all_units.symbol_id.isin(list(module_symbols.changed_unit_ids)))
+        if len(all_units) == 0:
+            util.debug("Incremental mode: no changed files")
+            return
+
     if options.benchmark:
         all_units = all_units.slice(0, config.MAX_BENCHMARK_TARGET)
 
     if len(all_units) == 0:
         util.error_and_quit("No files found for analysis.")
 
+    glang_parser.preload_tree_sitter_parsers(options.language)
     current_node_id = init_start_stmt_id(symbol_table)
+    if module_symbols.start_stmt_id is not None:
+        current_node_id = max(current_node_id, module_symbols.start_stmt_id)
     exporter = storage.Exporter(
-        os.path.join(options.workspace, config.GLANG_DIR), module_symbols
+        os.path.join(options.workspace, config.GLANG_DIR), module_symbols, module_symbols.start_bundle_count
     )
-    for row in all_units:
-        # if row.symbol_type == constants.SymbolKind.UNIT_SYMBOL and row.unit_ext in extensions:
-        current_node_id, glang_ir = glang_parser.deal_with_file_unit(
-            current_node_id, row.unit_path, options
-        )
-        exporter.add_data(glang_ir, row)
+    if options.cores > 1 and len(all_units) > 1:
+        run_parallel(options, all_units, current_node_id, exporter)
+    else:
+        run_serial(options, all_units, current_node_id, exporter)
     exporter.export()
+    module_symbols.apply_path_updates()
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
+import codecs
+import mmap
 import os,sys
 import pprint
+import time
 from ctypes import c_void_p, cdll
 import tree_sitter
 
@@ -57,6 +60,8 @@ def is_empty(node):
 class GLangProcess:
     def __init__(self, node_id):
         self.node_id = node_id
+        # (row_index, field) of each field holding a block id, see rebase()
+        self.block_refs = []
     
     def assign_id(self):
         previous = self.node_id
@@ -86,6 +91,7 @@ class GLangProcess:
         
         flattened_node = {}
         dataframe.append(flattened_node)
+        node_index = len(dataframe) - 1
 
         flattened_node["operation"] = list(stmt.keys())[0]
         stmt_content = stmt[flattened_node["operation"]]
@@ -101,10 +107,11 @@ class GLangProcess:
                     if myvalue == []:
                         flattened_node[mykey] = None
                     else:
-                        flattened_node[mykey] = str(myvalue)
+                        flattened_node[mykey] = myvalue
                 else:
                     block_id = self.flatten_block(myvalue, flattened_node["stmt_id"], dataframe)
                     flattened_node[mykey] = block_id
+                    self.block_refs.append((node_index, mykey))
                         
             elif isinstance(myvalue, dict):
                 util.error("[Input format error] Dictionary in expression: " + str(myvalue))
@@ -127,55 +134,184 @@ class GLangProcess:
 
         return flattened_nodes
 
-    def adjust_node_id(self, flattened_nodes):
-        self.node_id += max(len(flattened_nodes), config.MIN_ID_INTERVAL)
+    def adjust_node_id(self, node_count):
+        self.node_id += max(node_count, config.MIN_ID_INTERVAL)
         self.node_id = (self.node_id // config.MIN_ID_INTERVAL + 1) * config.MIN_ID_INTERVAL
     
+    def rebase(self, flattened_nodes, block_refs, offset):
+        """
+        Shift all ids of the nodes flattened from config.START_INDEX by offset.
+        The top-level statements keep their parent_stmt_id 0.
+        """
+        for node in flattened_nodes:
+            node["stmt_id"] += offset
+            if node["parent_stmt_id"] != 0:
+                node["parent_stmt_id"] += offset
+
+        for node_index, field in block_refs:
+            flattened_nodes[node_index][field] += offset
+
     def flatten(self, stmts):
         if not self.is_glang_format(stmts):
             util.error_and_quit("The input fromat of GLang IR is not correct.")
             return
 
         flattened_nodes = self.flatten_glang(stmts)
-        self.adjust_node_id(flattened_nodes)
+        self.adjust_node_id(len(flattened_nodes))
         return (self.node_id, flattened_nodes)
 
+class FlattenSink:
+    """
+    Take the place of the top-level stmt list of a language parser. Each top-level stmt is flattened when the next
+    one is appended, or at close(), since a parser may still fill a stmt after appending it. The rows are passed to
+    consumer, and the nested stmt is dropped.
+    """
+    def __init__(self, process, consumer):
+        self.process = process
+        self.consumer = consumer
+        self.pending_stmt = None
+        self.row_count = 0
+
+    def __len__(self):
+        return self.row_count + (self.pending_stmt is not None)
+
+    def append(self, stmt):
+        self.flush()
+        self.pending_stmt = stmt
+
+    def extend(self, stmts):
+        for stmt in stmts:
+            self.append(stmt)
+
+    def flush(self):
+        if self.pending_stmt is None:
+            return
+
+        flattened_nodes = []
+        with util.measure_phase("flatten"):
+            self.process.flatten_stmt(self.pending_stmt, flattened_nodes)
+        self.pending_stmt = None
+        self.row_count += len(flattened_nodes)
+        self.consumer(flattened_nodes)
+
+    def close(self):
+        self.flush()
+
 
 PARSERS = {
     "java"      	: java_parser,
     "typescript"    : typescript_parser,
 }
 
-def parse(options, file_path):
-    lang_option = determine_lang_by_path(file_path)
-    if lang_option is None:
-        return
+# lang -> tree_sitter.Parser, loaded once per process
+TREE_SITTER_PARSERS = {}
 
-    glang_ir_parser = PARSERS.get(lang_option)
-    if not glang_ir_parser:
-        util.error_and_quit("Unsupported language: " + options.language)
+def load_tree_sitter_parser(lang_option):
+    tree_sitter_parser = TREE_SITTER_PARSERS.get(lang_option)
+    if tree_sitter_parser is not None:
+        return tree_sitter_parser
 
+    start_time = time.perf_counter()
     # to avoid warning
     lib = cdll.LoadLibrary(os.fspath(config.LANGS_SO_PATH))
     language_function = getattr(lib, "tree_sitter_%s" % lang_option)
     language_function.restype = c_void_p
     language_id = language_function()
-    # tree_sitter_parser = tree_sitter.Parser()
     tree_sitter_lang = tree_sitter.Language(language_id)
-    # tree_sitter_parser.set_language(tree_sitter_lang)
     tree_sitter_parser = tree_sitter.Parser(tree_sitter_lang)
+    TREE_SITTER_PARSERS[lang_option] = tree_sitter_parser
+
+    util.debug(f"Loaded tree-sitter parser of {lang_option} in {time.perf_counter() - start_time:.4f}s")
+    return tree_sitter_parser
+
+def preload_tree_sitter_parsers(langs):
+    """
+    Load the parsers before the worker processes are forked, so that they are shared with the workers
+    """
+    for lang_option in langs:
+        lang_option = lang_option.strip()
+        if lang_option in PARSERS:
+            load_tree_sitter_parser(lang_option)
+
+def is_utf8(source):
+    """
+    Check source chunk by chunk, where the ASCII chunks are skipped, so that no whole copy of a large file is decoded
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunk_size = config.SOURCE_CHECK_CHUNK_SIZE
     try:
-        with open(file_path, 'r') as f:
-            code = f.read()
-        tree = tree_sitter_parser.parse(bytes(code, 'utf8'))
-        print(tree.root_node) # show AST
-    except:
-        util.error("Failed to parse AST:", file_path)
+        for start in range(0, len(source), chunk_size):
+            chunk = source[start:start + chunk_size]
+            # no partial multi-byte character is pending from the last chunk
+            if chunk.isascii() and not decoder.getstate()[0]:
+                continue
+            decoder.decode(chunk)
+        decoder.decode(b"", final = True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def read_source(file_path):
+    """
+    Return (source, source_map) of file_path for tree-sitter, where source is UTF-8 bytes, or a read-only mmap of
+    a large file, which should be closed through source_map after parsing. A file which is not UTF-8 is decoded
+    with config.SOURCE_FALLBACK_ENCODING, and converted to UTF-8.
+    """
+    source_map = None
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= config.SOURCE_MMAP_MIN_SIZE:
+            source_map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            source = source_map
+        else:
+            source = f.read()
+
+    if is_utf8(source):
+        return (source, source_map)
+
+    util.warn(f"{file_path} is not UTF-8, and is decoded as {config.SOURCE_FALLBACK_ENCODING}")
+    source = source[:].decode(config.SOURCE_FALLBACK_ENCODING).encode("utf-8")
+    if source_map is not None:
+        source_map.close()
+    return (source, None)
+
+def parse(options, file_path, glang_statements = None):
+    """
+    Return the GLang stmts of file_path, which are appended to glang_statements if given, e.g., a FlattenSink
+    """
+    lang_option = determine_lang_by_path(file_path)
+    if lang_option is None:
         return
 
-    glang_statements = []
-    parser = glang_ir_parser.Parser()
-    parser.parse(tree.root_node, glang_statements)
+    glang_ir_parser = PARSERS.get(lang_option)
+    if not glang_ir_parser:
+        util.error_and_quit("Unsupported language: " + options.language)
+
+    tree_sitter_parser = load_tree_sitter_parser(lang_option)
+    with util.measure_phase("parse"):
+        source_map = None
+        try:
+            source, source_map = read_source(file_path)
+            tree = tree_sitter_parser.parse(source)
+        except:
+            util.error("Failed to parse AST:", file_path)
+            if source_map is not None:
+                source_map.close()
+            return
+
+        if options.debug and options.print_stmts:
+            # show AST
+            util.debug(tree.root_node)
+
+        if glang_statements is None:
+            glang_statements = []
+        parser = glang_ir_parser.Parser()
+        parser.source = source
+        try:
+            parser.parse(tree.root_node, glang_statements)
+        finally:
+            parser.source = None
+            if source_map is not None:
+                source_map.close()
     return glang_statements
 
 def deal_with_file_unit(current_node_id, file_unit, options):
@@ -188,7 +324,8 @@ def deal_with_file_unit(current_node_id, file_unit, options):
     if options.debug and options.print_stmts:
         pprint.pprint(glang_statements, compact=True, sort_dicts=False)
 
-    current_node_id, flatten_nodes = GLangProcess(current_node_id).flatten(glang_statements)
+    with util.measure_phase("flatten"):
+        current_node_id, flatten_nodes = GLangProcess(current_node_id).flatten(glang_statements)
     if not flatten_nodes:
         return (current_node_id, flatten_nodes)
 
@@ -197,4 +334,60 @@ def deal_with_file_unit(current_node_id, file_unit, options):
 
     return (current_node_id, flatten_nodes)
 
-    
+def stream_file_unit(current_node_id, file_unit, unit_info, options, exporter):
+    """
+    Flatten the unit top-level stmt by top-level stmt into exporter, with the same stmt_ids and rows as
+    deal_with_file_unit(). The tree-sitter tree is dropped when parse() returns, and the nested stmts once they
+    are flattened. Return the next current_node_id.
+    """
+    if options.debug:
+        util.debug("Lang-Parser:", file_unit)
+
+    process = GLangProcess(current_node_id)
+    sink = FlattenSink(process, exporter.add_rows)
+    exporter.start_unit(unit_info)
+    parse(options, file_unit, sink)
+    sink.close()
+    exporter.end_unit()
+
+    if sink.row_count == 0:
+        return current_node_id
+    process.adjust_node_id(sink.row_count)
+    return process.node_id
+
+def parse_file_unit(file_unit, options):
+    """
+    Parse and flatten one unit without knowing its final stmt_id range, so that units can be handled in parallel.
+    Return (id_count, flatten_nodes, block_refs), which is placed by place_file_unit() later.
+    """
+    if options.debug:
+        util.debug("Lang-Parser:", file_unit)
+
+    glang_statements = parse(options, file_unit)
+    if not glang_statements:
+        return None
+    if options.debug and options.print_stmts:
+        pprint.pprint(glang_statements, compact=True, sort_dicts=False)
+
+    process = GLangProcess(config.START_INDEX)
+    if not process.is_glang_format(glang_statements):
+        util.error_and_quit("The input fromat of GLang IR is not correct.")
+        return None
+
+    with util.measure_phase("flatten"):
+        flatten_nodes = process.flatten_glang(glang_statements)
+    id_count = process.node_id - config.START_INDEX
+    return (id_count, flatten_nodes, process.block_refs)
+
+def place_file_unit(current_node_id, parsed_unit):
+    """
+    Move a unit returned by parse_file_unit() to the stmt_id range that deal_with_file_unit() would have assigned.
+    """
+    if parsed_unit is None:
+        return (current_node_id, None)
+
+    id_count, flatten_nodes, block_refs = parsed_unit
+    process = GLangProcess(current_node_id + id_count)
+    process.rebase(flatten_nodes, block_refs, current_node_id - config.START_INDEX)
+    process.adjust_node_id(len(flatten_nodes))
+    return (process.node_id, flatten_nodes)
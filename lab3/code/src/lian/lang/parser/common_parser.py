@@ -2,74 +2,73 @@
 
 import re
 
+# returned by Parser.dispatch() for the nodes without handler
+GENERIC_NODE = object()
 
 class Parser:
     def __init__(self):
+        # tmp_variable_list[i] is the tmp id of the i-th group of nodes, and -1 is for the groups created by
+        # sync_tmp_variable(). node_id_to_group maps id(node) to the first group containing the node.
         self.tmp_variable_list = []
+        self.node_id_to_group = {}
         self.method_id = -1
-
-    def create_new_tmp_variable_id(self, node, start_id):
-        self.tmp_variable_list.append(([node], [start_id]))
+        # the UTF-8 source given to tree-sitter, and (start_byte, end_byte) -> the decoded text of the nodes
+        self.source = None
+        self.node_text_cache = {}
+        # node type -> handler, built once by the language parser
+        self.literal_handler_map = None
+        self.declaration_handler_map = None
+        self.statement_handler_map = None
+        self.expression_handler_map = None
+
+    def find_group(self, node_id):
+        return self.node_id_to_group.get(node_id, -1)
 
     def sync_tmp_variable(self, node1, node2):
         node1_id = id(node1)
         node2_id = id(node2)
-        for item in self.tmp_variable_list:
-            if node1_id in item[0]:
-                if node2_id not in item[0]:
-                    item[0].append(node2_id)
-                return
-            if node2_id in item[0]:
-                if node1_id not in item[0]:
-                    item[0].append(node1_id)
-                return
-
-        self.tmp_variable_list.append(([node1_id, node2_id], [-1]))
+        group1 = self.find_group(node1_id)
+        group2 = self.find_group(node2_id)
+        if group1 == -1 and group2 == -1:
+            group = len(self.tmp_variable_list)
+            self.tmp_variable_list.append(-1)
+        elif group1 == -1:
+            group = group2
+        elif group2 == -1:
+            group = group1
+        else:
+            group = min(group1, group2)
+
+        self.node_id_to_group[node1_id] = group
+        self.node_id_to_group[node2_id] = group
 
     def have_same_id(self, node1, node2):
-        node1_id = id(node1)
-        node2_id = id(node2)
-        myid1 = -2
-        myid2 = -2
-        for item in self.tmp_variable_list:
-            if myid1 == -2 and node1_id in item[0]:
-                myid1 = item[1][0]
-            if myid2 == -2 and node2_id in item[0]:
-                myid2 = item[1][0]
-            if myid1 != -2 and myid2 != -2:
-                break
-        if -2 == myid1 and -2 == myid2:
+        group1 = self.find_group(id(node1))
+        group2 = self.find_group(id(node2))
+        if group1 == -1 and group2 == -1:
+            return False
+        if group1 == -1 or group2 == -1:
             return False
-        return myid2 == myid1
+        return self.tmp_variable_list[group1] == self.tmp_variable_list[group2]
 
     def check_id(self, node):
-        node_id = id(node)
-        tmp_id = -1
-        for item in self.tmp_variable_list:
-            if node_id in item[0]:
-                tmp_id = item[1][0]
-                break
-
-        return tmp_id
+        group = self.find_group(id(node))
+        if group == -1:
+            return -1
+        return self.tmp_variable_list[group]
 
     def tmp_variable(self, node):
-        node_id = id(node)  
-        tmp_id = -2  
-
-        for item in self.tmp_variable_list:
-            if node_id in item[0]:  
-                tmp_id = item[1][0]  
-                break
-
-        if tmp_id == -2:  
-            tmp_id = len(self.tmp_variable_list)  
-            self.create_new_tmp_variable_id(node, tmp_id)  
+        group = self.find_group(id(node))
+        if group != -1:
+            return "%v" + str(self.tmp_variable_list[group])
 
-        return "%v" + str(tmp_id) 
+        tmp_id = len(self.tmp_variable_list)
+        self.create_new_tmp_variable_id(node, tmp_id)
+        return "%v" + str(tmp_id)
 
     def create_new_tmp_variable_id(self, node, tmp_id):
-        node_id = id(node)
-        self.tmp_variable_list.append(([node_id], [tmp_id]))  
+        self.node_id_to_group[id(node)] = len(self.tmp_variable_list)
+        self.tmp_variable_list.append(tmp_id)
 
     def handle_hex_string(self, input_string):
         if self.is_hex_string(input_string):
@@ -184,37 +183,75 @@ class Parser:
     def read_node_text(self, input_node):
         if not input_node:
             return ""
-        return str(input_node.text, 'utf8')
-
-    def parse(self, node, statements=[], replacement=[]):
-        if not node:
-            return ""
+        if self.source is None:
+            return str(input_node.text, 'utf8')
+
+        key = (input_node.start_byte, input_node.end_byte)
+        text = self.node_text_cache.get(key)
+        if text is None:
+            text = str(self.source[key[0]:key[1]], 'utf8')
+            self.node_text_cache[key] = text
+        return text
+
+    def dispatch(self, node, statements, replacement):
+        """
+        Return the result of the handler of node, or GENERIC_NODE if there is no handler
+        """
+        if self.is_comment(node):
+            return None
+
+        if self.is_identifier(node):
+            return self.read_node_text(node)
 
-        elif self.is_comment(node):
-            return
+        handler = self.obtain_literal_handler(node)
+        if handler is not None:
+            return handler(node, statements, replacement)
 
-        elif self.is_identifier(node):
-            return self.read_node_text(node)
+        handler = self.check_declaration_handler(node)
+        if handler is not None:
+            return handler(node, statements)
 
-        elif self.is_literal(node):
-            return self.literal(node, statements, replacement)
+        handler = self.check_statement_handler(node)
+        if handler is not None:
+            return handler(node, statements)
 
-        elif self.is_declaration(node):
-            return self.declaration(node, statements)
+        handler = self.check_expression_handler(node)
+        if handler is not None:
+            return handler(node, statements)
 
-        elif self.is_statement(node):
-            return self.statement(node, statements)
+        return GENERIC_NODE
 
-        elif self.is_expression(node):
-            return self.expression(node, statements)
+    def parse(self, node, statements=[], replacement=[]):
+        if not node:
+            return ""
 
-        else:
-            size = len(node.named_children)
-            for i in range(size):
-                ret = self.parse(node.named_children[i], statements, replacement)
-                if i + 1 == size:
+        ret = self.dispatch(node, statements, replacement)
+        if ret is not GENERIC_NODE:
+            return ret
+
+        # A node without handler returns the result of its last named child, which is found by walking the nested
+        # nodes without handler with a cursor instead of recursion
+        ret = None
+        cursor = node.walk()
+        if not cursor.goto_first_child():
+            return ret
+        depth = 1
+        while True:
+            child = cursor.node
+            if child.is_named:
+                ret = self.dispatch(child, statements, replacement)
+                if ret is GENERIC_NODE:
+                    ret = None
+                    if cursor.goto_first_child():
+                        depth += 1
+                        continue
+
+            while not cursor.goto_next_sibling():
+                depth -= 1
+                if depth == 0:
                     return ret
-                
+                cursor.goto_parent()
+
     def print_tree(self, node, level=0, field = None):
         if not node:
             return
@@ -5,6 +5,12 @@ from . import common_parser
 
 
 class Parser(common_parser.Parser):
+    def __init__(self):
+        super().__init__()
+        # ids of the binary expressions with a non-constant operand, which evaluate_literal_binary_expression()
+        # does not need to walk again
+        self.unevaluable_binary_ids = set()
+
     def is_comment(self, node):
         return node.type in ["line_comment", "block_comment"]
 
@@ -381,6 +387,16 @@ class Parser(common_parser.Parser):
                                                "operand": shadow_left, "operand2": shadow_right}})
         return shadow_left
 
+    def mark_unevaluable(self, node, root):
+        """
+        node cannot be evaluated, and so are the binary expressions from node up to root
+        """
+        while node is not None:
+            self.unevaluable_binary_ids.add(node.id)
+            if node.id == root.id:
+                return
+            node = node.parent
+
     def evaluate_literal_binary_expression(self, root, statements):
         node_list = [root]
         nodes_to_be_computed = []
@@ -389,6 +405,9 @@ class Parser(common_parser.Parser):
         if not root:
             return
 
+        if root.id in self.unevaluable_binary_ids:
+            return
+
         # determine if it is a real literal_binary_expression
         while (len(node_list) > 0):
             node = node_list.pop()
@@ -402,6 +421,8 @@ class Parser(common_parser.Parser):
                 continue
 
             if not self.is_constant_literal(node) and node.type != "binary_expression":
+                if node.id != root.id:
+                    self.mark_unevaluable(node.parent, root)
                 return
 
             # literal
@@ -424,6 +445,7 @@ class Parser(common_parser.Parser):
                 if value is None:
                     binary_expr_value_map[node.id] = None
                     binary_expr_value_map[root.id] = None
+                    self.mark_unevaluable(node, root)
                     return
 
                 if self.is_string(shadow_left):
@@ -495,20 +517,32 @@ class Parser(common_parser.Parser):
         if evaluated_value is not None:
             return evaluated_value
 
+        # walk down the left operands which are binary expressions too, e.g., a + b + c + ..., instead of recursion
+        chain = [node]
         left = self.find_child_by_field(node, "left")
-        right = self.find_child_by_field(node, "right")
-        operator = self.find_child_by_field(node, "operator")
+        while left and left.type == "binary_expression":
+            evaluated_value = self.evaluate_literal_binary_expression(left, statements)
+            if evaluated_value is not None:
+                shadow_left = evaluated_value
+                break
+            chain.append(left)
+            left = self.find_child_by_field(left, "left")
+        else:
+            shadow_left = self.parse(left, statements)
 
-        shadow_operator = self.read_node_text(operator)
+        for node in reversed(chain):
+            right = self.find_child_by_field(node, "right")
+            operator = self.find_child_by_field(node, "operator")
 
-        shadow_left = self.parse(left, statements)
-        shadow_right = self.parse(right, statements)
+            shadow_operator = self.read_node_text(operator)
+            shadow_right = self.parse(right, statements)
 
-        tmp_var = self.tmp_variable(statements)
-        statements.append({"assign_stmt": {"target": tmp_var, "operator": shadow_operator, "operand": shadow_left,
-                                           "operand2": shadow_right}})
+            tmp_var = self.tmp_variable(statements)
+            statements.append({"assign_stmt": {"target": tmp_var, "operator": shadow_operator, "operand": shadow_left,
+                                               "operand2": shadow_right}})
+            shadow_left = tmp_var
 
-        return tmp_var
+        return shadow_left
 
     def instanceof_expression(self, node, statements):
         left = self.find_child_by_field(node, "left")
@@ -758,14 +792,30 @@ class Parser(common_parser.Parser):
     def call_expression(self, node, statements):
         # SomeClass.super.<ArgType>genericMethod()
 
-        name = self.find_child_by_field(node, "name")
-        shadow_name = self.parse(name, statements)
+        # walk down the objects which are calls too, e.g., builder.a().b().c(), instead of recursion
+        chain = []
+        while True:
+            name = self.find_child_by_field(node, "name")
+            chain.append((node, self.parse(name, statements)))
+            myobject = self.find_child_by_field(node, "object")
+            if not myobject or myobject.type != "method_invocation":
+                break
+            node = myobject
 
         shadow_object = ""
+        if myobject:
+            shadow_object = self.parse(myobject, statements)
+        for node, shadow_name in reversed(chain):
+            shadow_object = self.call_with_object(node, shadow_name, shadow_object, statements)
+        return shadow_object
+
+    def call_with_object(self, node, shadow_name, shadow_object, statements):
+        """
+        Add the call of node, whose name and object are parsed
+        """
         myobject = self.find_child_by_field(node, "object")
         type_text = ""
         if myobject:
-            shadow_object = self.parse(myobject, statements)
             type_arguments = self.find_child_by_field(node, "type_arguments")
             if type_arguments:
                 type_text = self.read_node_text(type_arguments)[1:-1]
@@ -1302,89 +1352,93 @@ class Parser(common_parser.Parser):
                 self.parse(child, glang_node["nested"])
 
     def obtain_literal_handler(self, node):
-        LITERAL_MAP = {
-            "decimal_integer_literal": self.regular_number_literal,
-            "hex_integer_literal": self.regular_number_literal,
-            "octal_integer_literal": self.regular_number_literal,
-            "binary_integer_literal": self.regular_number_literal,
-            "decimal_floating_point_literal": self.regular_number_literal,
-            "hex_floating_point_literal": self.hex_float_literal,
-            "true": self.regular_literal,
-            "false": self.regular_literal,
-            "character_literal": self.character_literal,
-            "null_literal": self.regular_literal,
-            "class_literal": self.regular_literal,
-            "identifier": self.regular_literal,
-            "this": self.this_literal,
-            "super": self.super_literal,
-            "string_literal": self.string_literal,
-            "string_interpolation": self.string_interpolation
-        }
-
-        return LITERAL_MAP.get(node.type, None)
+        if self.literal_handler_map is None:
+            self.literal_handler_map = {
+                "decimal_integer_literal": self.regular_number_literal,
+                "hex_integer_literal": self.regular_number_literal,
+                "octal_integer_literal": self.regular_number_literal,
+                "binary_integer_literal": self.regular_number_literal,
+                "decimal_floating_point_literal": self.regular_number_literal,
+                "hex_floating_point_literal": self.hex_float_literal,
+                "true": self.regular_literal,
+                "false": self.regular_literal,
+                "character_literal": self.character_literal,
+                "null_literal": self.regular_literal,
+                "class_literal": self.regular_literal,
+                "identifier": self.regular_literal,
+                "this": self.this_literal,
+                "super": self.super_literal,
+                "string_literal": self.string_literal,
+                "string_interpolation": self.string_interpolation
+            }
+
+        return self.literal_handler_map.get(node.type, None)
 
     def check_expression_handler(self, node):
-        EXPRESSION_HANDLER_MAP = {
-            "assignment_expression": self.assignment_expression,
-            "binary_expression": self.binary_expression,
-            "instanceof_expression": self.instanceof_expression,
-            "unary_expression": self.unary_expression,
-            "ternary_expression": self.ternary_expression,
-            "update_expression": self.update_expression,
-            "cast_expression": self.cast_expression,
-            "lambda_expression": self.lambda_expression,
-            "switch_expression": self.switch_expression,
-            "field_access": self.field,
-            "array_access": self.array,
-            "method_invocation": self.call_expression,
-            "array_creation_expression": self.new_array,
-            "object_creation_expression": self.new_instance,
-            "marker_annotation": self.annotation,
-            "annotation": self.annotation,
-            "receiver_parameter": self.ignore,
-            "formal_parameter": self.formal_parameter,
-            "spread_parameter": self.arg_list,
-        }
-
-        return EXPRESSION_HANDLER_MAP.get(node.type, None)
+        if self.expression_handler_map is None:
+            self.expression_handler_map = {
+                "assignment_expression": self.assignment_expression,
+                "binary_expression": self.binary_expression,
+                "instanceof_expression": self.instanceof_expression,
+                "unary_expression": self.unary_expression,
+                "ternary_expression": self.ternary_expression,
+                "update_expression": self.update_expression,
+                "cast_expression": self.cast_expression,
+                "lambda_expression": self.lambda_expression,
+                "switch_expression": self.switch_expression,
+                "field_access": self.field,
+                "array_access": self.array,
+                "method_invocation": self.call_expression,
+                "array_creation_expression": self.new_array,
+                "object_creation_expression": self.new_instance,
+                "marker_annotation": self.annotation,
+                "annotation": self.annotation,
+                "receiver_parameter": self.ignore,
+                "formal_parameter": self.formal_parameter,
+                "spread_parameter": self.arg_list,
+            }
+
+        return self.expression_handler_map.get(node.type, None)
 
     def check_declaration_handler(self, node):
-        DECLARATION_HANDLER_MAP = {
-            "package_declaration": self.package_declaration,
-            "import_declaration": self.import_declaration,
-            "variable_declaration": self.variable_and_constand_declaration,
-            "local_variable_declaration": self.variable_and_constand_declaration,
-            "field_declaration": self.variable_and_constand_declaration,
-            "constant_declaration": self.variable_and_constand_declaration,
-            "class_declaration": self.class_declaration,
-            "interface_declaration": self.class_declaration,
-            "record_declaration": self.class_declaration,
-            "constructor_declaration": self.method_declaration,
-            "compact_constructor_declaration": self.method_declaration,
-            "method_declaration": self.method_declaration,
-            "enum_declaration": self.enum_declaration,
-            "annotation_type_declaration": self.annotation_type_declaration
-        }
-        return DECLARATION_HANDLER_MAP.get(node.type, None)
+        if self.declaration_handler_map is None:
+            self.declaration_handler_map = {
+                "package_declaration": self.package_declaration,
+                "import_declaration": self.import_declaration,
+                "variable_declaration": self.variable_and_constand_declaration,
+                "local_variable_declaration": self.variable_and_constand_declaration,
+                "field_declaration": self.variable_and_constand_declaration,
+                "constant_declaration": self.variable_and_constand_declaration,
+                "class_declaration": self.class_declaration,
+                "interface_declaration": self.class_declaration,
+                "record_declaration": self.class_declaration,
+                "constructor_declaration": self.method_declaration,
+                "compact_constructor_declaration": self.method_declaration,
+                "method_declaration": self.method_declaration,
+                "enum_declaration": self.enum_declaration,
+                "annotation_type_declaration": self.annotation_type_declaration
+            }
+        return self.declaration_handler_map.get(node.type, None)
 
     def check_statement_handler(self, node):
-        STATEMENT_HANDLER_MAP = {
-            "labeled_statement": self.label_statement,
-            "if_statement": self.if_statement,
-            "while_statement": self.while_statement,
-            "for_statement": self.for_statement,
-            "enhanced_for_statement": self.forin_statement,
-            "assert_statement": self.assert_statement,
-            "do_statement": self.dowhile_statement,
-            "break_statement": self.break_statement,
-            "continue_statement": self.continue_statement,
-            "return_statement": self.return_statement,
-            "yield_statement": self.yield_statement,
-            "throw_statement": self.throw_statement,
-            "try_statement": self.try_statement,
-        }
-
-        return STATEMENT_HANDLER_MAP.get(node.type, None)
+        if self.statement_handler_map is None:
+            self.statement_handler_map = {
+                "labeled_statement": self.label_statement,
+                "if_statement": self.if_statement,
+                "while_statement": self.while_statement,
+                "for_statement": self.for_statement,
+                "enhanced_for_statement": self.forin_statement,
+                "assert_statement": self.assert_statement,
+                "do_statement": self.dowhile_statement,
+                "break_statement": self.break_statement,
+                "continue_statement": self.continue_statement,
+                "return_statement": self.return_statement,
+                "yield_statement": self.yield_statement,
+                "throw_statement": self.throw_statement,
+                "try_statement": self.try_statement,
+            }
+
+        return self.statement_handler_map.get(node.type, None)
 
     def is_literal(self, node):
         return self.obtain_literal_handler(node) is not None
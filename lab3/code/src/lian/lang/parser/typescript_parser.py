@@ -11,22 +11,23 @@ class Parser(common_parser.Parser):
         return node.type == "identifier"
 
     def obtain_literal_handler(self, node):
-        LITERAL_MAP = {
-            "null": self.regular_literal,
-            "true": self.regular_literal,
-            "false": self.regular_literal,
-            "identifier": self.regular_literal,
-            "number": self.regular_number_literal,
-            "string": self.string_literal,
-            "summary_string": self.string_literal,
-            "summary_substitution": self.string_substitution,
-            "this": self.this_literal,
-            "super": self.super_literal,
-            "private_property_identifier": self.regular_literal,
-            "property_identifier": self.regular_literal
-        }
-
-        return LITERAL_MAP.get(node.type, None)
+        if self.literal_handler_map is None:
+            self.literal_handler_map = {
+                "null": self.regular_literal,
+                "true": self.regular_literal,
+                "false": self.regular_literal,
+                "identifier": self.regular_literal,
+                "number": self.regular_number_literal,
+                "string": self.string_literal,
+                "summary_string": self.string_literal,
+                "summary_substitution": self.string_substitution,
+                "this": self.this_literal,
+                "super": self.super_literal,
+                "private_property_identifier": self.regular_literal,
+                "property_identifier": self.regular_literal
+            }
+
+        return self.literal_handler_map.get(node.type, None)
 
     def is_literal(self, node):
         return self.obtain_literal_handler(node) is not None
@@ -36,26 +37,27 @@ class Parser(common_parser.Parser):
         return handler(node, statements, replacement)
 
     def check_declaration_handler(self, node):
-        DECLARATION_HANDLER_MAP = {
-            "function_declaration": self.method_declaration,
-            "class_declaration": self.class_declaration,
-            "interface_declaration": self.interface_declaration,
-            "enum_declaration": self.enum_declaration,
-            "type_alias_declaration": self.type_alias_declaration,
-            "method_declaration": self.method_declaration,
-            "abstract_class_declaration": self.class_declaration,
-            "generator_function_declaration": self.method_declaration,
-            "module": self.module_declaration,
-            "inport_alis": self.import_declaration,
-            "method_definition": self.method_declaration,
-            "abstract_method_signature": self.method_declaration,
-            "method_signature": self.method_declaration,
-            "public_field_definition": self.public_field_definition,
-            "function_signature": self.method_declaration,
-            "variable_declaration":self.variable_declaration,
-            "lexical_declaration":self.variable_declaration,
-        }
-        return DECLARATION_HANDLER_MAP.get(node.type, None)
+        if self.declaration_handler_map is None:
+            self.declaration_handler_map = {
+                "function_declaration": self.method_declaration,
+                "class_declaration": self.class_declaration,
+                "interface_declaration": self.interface_declaration,
+                "enum_declaration": self.enum_declaration,
+                "type_alias_declaration": self.type_alias_declaration,
+                "method_declaration": self.method_declaration,
+                "abstract_class_declaration": self.class_declaration,
+                "generator_function_declaration": self.method_declaration,
+                "module": self.module_declaration,
+                "inport_alis": self.import_declaration,
+                "method_definition": self.method_declaration,
+                "abstract_method_signature": self.method_declaration,
+                "method_signature": self.method_declaration,
+                "public_field_definition": self.public_field_definition,
+                "function_signature": self.method_declaration,
+                "variable_declaration":self.variable_declaration,
+                "lexical_declaration":self.variable_declaration,
+            }
+        return self.declaration_handler_map.get(node.type, None)
 
     def is_declaration(self, node):
         return self.check_declaration_handler(node) is not None
@@ -65,41 +67,42 @@ class Parser(common_parser.Parser):
         return handler(node, statements)
 
     def check_expression_handler(self, node):
-        EXPRESSION_HANDLER_MAP = {
-            "assignment_expression": self.assignment_expression,
-            "assignment_pattern": self.assignment_expression,  # "assignment_pattern" is a special case of "assignment_expression
-            "pattern": self.pattern,
-            "rest_pattern": self.pattern,
-            "binary_expression": self.binary_expression,
-            "subscript_expression": self.parse_subscript,
-            "call_expression": self.call_expression,
-            "unary_expression": self.unary_expression,
-            "member_expression": self.member_expression,
-            "ternary_expression": self.ternary_expression,
-            "new_expression": self.new_expression,
-            "yield_expression": self.yield_expression,
-            "augmented_assignment_expression": self.augmented_assignment_expression,
-            "non_null_expressopn": self.non_null_expression,
-            "array": self.array,
-            "parenthesized_expression": self.parenthesized_expression,
-            "await_expression": self.await_expression,
-            "as_expression": self.as_expression,
-            "satisfies_expression": self.satisfies_expression,
-            "type_assertion": self.type_assertion,
-            "update_expression": self.update_expression,
-            "object_assignment_pattern": self.assignment_expression,
-            "pair_pattern": self.parse_pair_pattern,
-            "object_pattern": self.parse_object,
-            "object": self.parse_object,
-            "pair": self.parse_pair_pattern,
-            "spread_element": self.pattern,
-            "arrow_function": self.arrow_function,
-            "function_expression": self.method_declaration,
-            # "required_parameter": self.formal_parameter,
-            # "optional_parameter": self.formal_parameter,
-        }
-
-        return EXPRESSION_HANDLER_MAP.get(node.type, None)
+        if self.expression_handler_map is None:
+            self.expression_handler_map = {
+                "assignment_expression": self.assignment_expression,
+                "assignment_pattern": self.assignment_expression,  # "assignment_pattern" is a special case of "assignment_expression
+                "pattern": self.pattern,
+                "rest_pattern": self.pattern,
+                "binary_expression": self.binary_expression,
+                "subscript_expression": self.parse_subscript,
+                "call_expression": self.call_expression,
+                "unary_expression": self.unary_expression,
+                "member_expression": self.member_expression,
+                "ternary_expression": self.ternary_expression,
+                "new_expression": self.new_expression,
+                "yield_expression": self.yield_expression,
+                "augmented_assignment_expression": self.augmented_assignment_expression,
+                "non_null_expressopn": self.non_null_expression,
+                "array": self.array,
+                "parenthesized_expression": self.parenthesized_expression,
+                "await_expression": self.await_expression,
+                "as_expression": self.as_expression,
+                "satisfies_expression": self.satisfies_expression,
+                "type_assertion": self.type_assertion,
+                "update_expression": self.update_expression,
+                "object_assignment_pattern": self.assignment_expression,
+                "pair_pattern": self.parse_pair_pattern,
+                "object_pattern": self.parse_object,
+                "object": self.parse_object,
+                "pair": self.parse_pair_pattern,
+                "spread_element": self.pattern,
+                "arrow_function": self.arrow_function,
+                "function_expression": self.method_declaration,
+                # "required_parameter": self.formal_parameter,
+                # "optional_parameter": self.formal_parameter,
+            }
+
+        return self.expression_handler_map.get(node.type, None)
 
     def is_expression(self, node):
         return self.check_expression_handler(node) is not None
@@ -109,27 +112,28 @@ class Parser(common_parser.Parser):
         return handler(node, statements)
 
     def check_statement_handler(self, node):
-        STATEMENT_HANDLER_MAP = {
-            "statement_block": self.statement_block,
-            "for_statement": self.for_statement,
-            "for_in_statement": self.for_in_statement,
-            "if_statement": self.if_statement,
-            "while_statement": self.while_statement,
-            "do_statement": self.do_statement,
-            "switch_statement": self.switch_statement,
-            "break_statement": self.break_statement,
-            "continue_statement": self.continue_statement,
-            "return_statement": self.return_statement,
-            "throw_statement": self.throw_statement,
-            "try_statement": self.try_statement,
-            "export_statement": self.export_statement,
-            "import_statement": self.import_statement,
-            "labeled_statement": self.labeled_statement,
-            "expression_statement": self.expression_statement,
-            "with_statement": self.with_statement,
-            "empty_statement": self.empty_statement,
-        }
-        return STATEMENT_HANDLER_MAP.get(node.type, None)
+        if self.statement_handler_map is None:
+            self.statement_handler_map = {
+                "statement_block": self.statement_block,
+                "for_statement": self.for_statement,
+                "for_in_statement": self.for_in_statement,
+                "if_statement": self.if_statement,
+                "while_statement": self.while_statement,
+                "do_statement": self.do_statement,
+                "switch_statement": self.switch_statement,
+                "break_statement": self.break_statement,
+                "continue_statement": self.continue_statement,
+                "return_statement": self.return_statement,
+                "throw_statement": self.throw_statement,
+                "try_statement": self.try_statement,
+                "export_statement": self.export_statement,
+                "import_statement": self.import_statement,
+                "labeled_statement": self.labeled_statement,
+                "expression_statement": self.expression_statement,
+                "with_statement": self.with_statement,
+                "empty_statement": self.empty_statement,
+            }
+        return self.statement_handler_map.get(node.type, None)
 
     def is_statement(self, node):
         return self.check_statement_handler(node) is not None
@@ -281,21 +285,30 @@ class Parser(common_parser.Parser):
         return self.parse(self.node.named_children[0], statements)
 
     def binary_expression(self, node: Node, statements: list):
-        operator = self.find_child_by_field(node, "operator")
-        shadow_operator = self.read_node_text(operator)
-        right = self.find_child_by_field(node, "right")
-        shadow_right = self.parse(right, statements)
-        left = self.find_child_by_field(node, "left")
+        # walk down the left operands which are binary expressions too, e.g., a + b + c + ..., instead of recursion
+        chain = []
+        while True:
+            operator = self.find_child_by_field(node, "operator")
+            shadow_operator = self.read_node_text(operator)
+            right = self.find_child_by_field(node, "right")
+            shadow_right = self.parse(right, statements)
+            chain.append((node, shadow_operator, shadow_right))
+            left = self.find_child_by_field(node, "left")
+            if not left or left.type != "binary_expression":
+                break
+            node = left
 
         if shadow_operator == "in" and left.type == "private_property_identifier":
             shadow_left = self.parse_private_property_identifier(left, statements)
         else:
             shadow_left = self.parse(left, statements)
 
-        tmp_var = self.tmp_variable(node)
-        statements.append({"assign_stmt": {"target": tmp_var, "operator": shadow_operator, "operand": shadow_left,
-                                        "operand2": shadow_right}})
-        return tmp_var
+        for node, shadow_operator, shadow_right in reversed(chain):
+            tmp_var = self.tmp_variable(node)
+            statements.append({"assign_stmt": {"target": tmp_var, "operator": shadow_operator, "operand": shadow_left,
+                                            "operand2": shadow_right}})
+            shadow_left = tmp_var
+        return shadow_left
 
     def parse_private_property_identifier(self, node: Node, statements: list):
             return self.read_node_text(node)
@@ -2,42 +2,245 @@
 
 import os,sys
 import pandas as pd
+import pyarrow as pa
 import socket
 import re
 
 from lian.config import config, schema
 from lian.init import module_symbols
 from lian.util import dataframe_operation as do
+from lian.util import util
 
 
+def build_unit_index(unit_ids):
+    """
+    Find the row range of each unit in a bundle, where the rows of a unit are contiguous
+    """
+    unit_index = []
+    start_row = 0
+    for row_index in range(1, len(unit_ids) + 1):
+        if row_index == len(unit_ids) or unit_ids[row_index] != unit_ids[start_row]:
+            unit_index.append({
+                "unit_id": unit_ids[start_row],
+                "start_row": start_row,
+                "end_row": row_index,
+            })
+            start_row = row_index
+    return unit_index
+
+def save_unit_index(unit_index, bundle_path):
+    do.DataFrameAgent(unit_index, columns = schema.unit_index_schema).save(bundle_path + config.UNIT_INDEX_EXT)
+
+def build_glang_arrow_schema():
+    fields = []
+    for column_name in schema.glang_schema:
+        if column_name in schema.glang_int_fields:
+            fields.append(pa.field(column_name, pa.int64()))
+        elif column_name in schema.glang_dictionary_fields:
+            fields.append(pa.field(column_name, pa.dictionary(pa.int32(), pa.string())))
+        elif column_name in schema.glang_list_fields:
+            fields.append(pa.field(column_name, pa.list_(pa.string())))
+        else:
+            fields.append(pa.field(column_name, pa.string()))
+    return pa.schema(fields)
+
+GLANG_ARROW_SCHEMA = build_glang_arrow_schema()
+
+def to_string_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+def to_list_value(value):
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        value = [value]
+    return [to_string_value(element) for element in value]
+
+def glang_write_options():
+    return pa.ipc.IpcWriteOptions(compression = config.GLANG_BUNDLE_COMPRESSION, emit_dictionary_deltas = True)
+
+class ColumnDictionary:
+    """
+    The dictionary of a dictionary-encoded column in a bundle. It only grows, so that the dictionary of each batch
+    extends the one of the previous batch and is written as a delta, and its string array is extended with the new
+    values only.
+    """
+    def __init__(self):
+        # never start with an empty dictionary, which is not extended by deltas but replaced
+        self.indexes = {"": 0}
+        self.values = pa.array([""], type = pa.string())
+
+    def encode(self, values):
+        indices = []
+        new_values = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            index = self.indexes.get(value)
+            if index is None:
+                index = len(self.indexes)
+                self.indexes[value] = index
+                new_values.append(value)
+            indices.append(index)
+
+        if len(new_values) > 0:
+            self.values = pa.concat_arrays([self.values, pa.array(new_values, type = pa.string())])
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type = pa.int32()), self.values)
+
+    def nulls(self, size):
+        return pa.DictionaryArray.from_arrays(pa.nulls(size, type = pa.int32()), self.values)
+
+def to_record_batch(flatten_nodes, unit_id, dictionaries, used_columns):
+    """
+    Convert the flattened nodes of one unit to a record batch of GLANG_ARROW_SCHEMA, and add the columns with
+    values to used_columns
+    """
+    arrays = []
+    for field in GLANG_ARROW_SCHEMA:
+        if field.name == "unit_id":
+            arrays.append(pa.array([unit_id] * len(flatten_nodes), type = field.type))
+            continue
+
+        values = [node.get(field.name) for node in flatten_nodes]
+        if pa.types.is_dictionary(field.type):
+            dictionary = dictionaries.get(field.name)
+            if dictionary is None:
+                dictionary = dictionaries[field.name] = ColumnDictionary()
+
+        if all(value is None for value in values):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(dictionary.nulls(len(values)))
+            else:
+                arrays.append(pa.nulls(len(values), type = field.type))
+            continue
+
+        used_columns.add(field.name)
+        if pa.types.is_integer(field.type):
+            arrays.append(pa.array(values, type = field.type))
+        elif pa.types.is_dictionary(field.type):
+            arrays.append(dictionary.encode([to_string_value(value) for value in values]))
+        elif pa.types.is_list(field.type):
+            arrays.append(pa.array([to_list_value(value) for value in values], type = field.type))
+        else:
+            arrays.append(pa.array([to_string_value(value) for value in values], type = field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema = GLANG_ARROW_SCHEMA)
+
+def compact_bundle(bundle_path, column_names):
+    """
+    Rewrite the bundle with column_names only, reading it batch by batch
+    """
+    compact_path = bundle_path + ".compact"
+    with pa.OSFile(bundle_path, "rb") as source:
+        reader = pa.ipc.open_file(source)
+        compact_schema = pa.schema([field for field in reader.schema if field.name in column_names])
+        with pa.ipc.new_file(compact_path, compact_schema, options = glang_write_options()) as writer:
+            for index in range(reader.num_record_batches):
+                writer.write_batch(reader.get_batch(index).select(compact_schema.names))
+    os.replace(compact_path, bundle_path)
+
 class Exporter:
-    def __init__(self, output_path, symbols: module_symbols.ModuleSymbols):
+    def __init__(self, output_path, symbols: module_symbols.ModuleSymbols, count = 0):
         self.accumulated_rows = []
+        # the row range of each unit in the current bundle
+        self.unit_index = []
+        self.row_count = 0
+        # stream the units into the current bundle instead of accumulating them
+        self.streaming = config.STREAMING_EXPORT
+        self.writer = None
+        # column -> ColumnDictionary of the dictionary-encoded columns in the current bundle
+        self.dictionaries = {}
+        # the columns with any value in the current bundle, the others are dropped by export()
+        self.used_columns = {"unit_id"}
         self.output_path = output_path
         self.max_rows = config.MAX_ROWS
-        self.count = 0
+        self.count = count
         self.bundle_path = os.path.join(self.output_path, f"glang_bundle{self.count}")
         self.symbols = symbols
-    
+
+        # the unit being added by add_rows(), and its rows not written yet
+        self.unit_info = None
+        self.unit_start_row = 0
+        self.unit_rows = []
+
     @profile
     def add_data(self, flatten_nodes, unit_info):
         if flatten_nodes is None or len(flatten_nodes) == 0:
             return
 
-        unit_id = unit_info.symbol_id
-        for node in flatten_nodes:
-            node["unit_id"] = unit_id
-        self.accumulated_rows.extend(flatten_nodes)
+        self.start_unit(unit_info)
+        self.add_rows(flatten_nodes)
+        self.end_unit()
+
+    def start_unit(self, unit_info):
+        self.unit_info = unit_info
+        self.unit_start_row = self.row_count
+
+    def add_rows(self, flatten_nodes):
+        """
+        Add some rows of the current unit, which are written once there are config.EXPORT_BATCH_ROWS of them
+        """
+        self.unit_rows.extend(flatten_nodes)
+        self.row_count += len(flatten_nodes)
+        if len(self.unit_rows) >= config.EXPORT_BATCH_ROWS:
+            self.flush_unit_rows()
+
+    def flush_unit_rows(self):
+        if len(self.unit_rows) == 0:
+            return
+
+        unit_id = self.unit_info.symbol_id
+        with util.measure_phase("export"):
+            if self.streaming:
+                self.write_batch(self.unit_rows, unit_id)
+            else:
+                for node in self.unit_rows:
+                    node["unit_id"] = unit_id
+                self.accumulated_rows.extend(self.unit_rows)
+        self.unit_rows = []
+
+    def end_unit(self):
+        self.flush_unit_rows()
+        unit_info = self.unit_info
+        self.unit_info = None
+        if self.row_count == self.unit_start_row:
+            return
+
+        util.add_unit_metrics(unit_info.symbol_id, {"rows_exported": self.row_count - self.unit_start_row})
+        self.unit_index.append({
+            "unit_id": unit_info.symbol_id,
+            "start_row": self.unit_start_row,
+            "end_row": self.row_count,
+        })
         self.symbols.update_glang_path(unit_info, self.bundle_path)
 
-        if len(self.accumulated_rows) >= self.max_rows:
+        if self.row_count >= self.max_rows:
             self.export()
 
+    def write_batch(self, flatten_nodes, unit_id):
+        if self.writer is None:
+            self.writer = pa.ipc.new_file(self.bundle_path, GLANG_ARROW_SCHEMA, options = glang_write_options())
+        self.writer.write_batch(to_record_batch(flatten_nodes, unit_id, self.dictionaries, self.used_columns))
+
     def export(self):
-        if len(self.accumulated_rows) > 0:
-            do.DataFrameAgent(self.accumulated_rows).save(self.bundle_path)
+        if self.row_count > 0:
+            with util.measure_phase("export"):
+                if self.writer is not None:
+                    self.writer.close()
+                    if len(self.used_columns) < len(GLANG_ARROW_SCHEMA):
+                        compact_bundle(self.bundle_path, self.used_columns)
+                else:
+                    do.DataFrameAgent(self.accumulated_rows).save(self.bundle_path)
+                save_unit_index(self.unit_index, self.bundle_path)
 
         self.accumulated_rows = []
+        self.unit_index = []
+        self.row_count = 0
+        self.writer = None
+        self.dictionaries = {}
+        self.used_columns = {"unit_id"}
         self.count += 1
         self.bundle_path = os.path.join(self.output_path, f"glang_bundle{self.count}")
 
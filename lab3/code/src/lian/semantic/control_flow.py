@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 
-import networkx as nx
-
 from lian.config import config,schema
 from lian.util import util
 from lian.util import dataframe_operation as do
@@ -60,26 +58,13 @@ class ControlFlowAnalysis(InternalAnalysisTemplate):
             cfg_png_path = semantic_path + "_cfg.png"
             self.cfg.save_png(cfg_png_path)
 
-    def replace_multiple_edges_with_single(self):
-        flag = True
-        old_graph = self.cfg.graph
-        for u, v in old_graph.edges():
-            if old_graph.number_of_edges(u, v) > 1:
-                flag = False
-                break
+    def collect_method_results(self):
+        results = self.all_cfg_edges
+        self.all_cfg_edges = []
+        return results
 
-        if flag:
-            return
-        
-        new_graph = nx.DiGraph()
-        for u, v in old_graph.edges():
-            if old_graph.number_of_edges(u, v) > 1:
-                # total_weight = sum(old_graph[u][v][key]['weight'] for key in old_graph[u][v])
-                new_graph.add_edge(u, v, weight = ControlFlowKind.EMPTY)
-            else:
-                if not new_graph.has_edge(u, v):
-                    new_graph.add_edge(u, v, weight = old_graph[u][v][0]['weight'])
-        self.cfg.graph = new_graph
+    def merge_method_results(self, results):
+        self.all_cfg_edges.extend(results)
 
     def save_current_cfg(self):
         edges = []
@@ -111,7 +96,8 @@ class ControlFlowAnalysis(InternalAnalysisTemplate):
             self.cfg.add_edge(last_stmts, -1)
         # util.debug("cfg "*20)
         # util.debug(list(self.cfg.graph.edges(data=True)))
-        self.replace_multiple_edges_with_single()
+        # multiple edges are replaced with a single one when the graph is frozen
+        self.cfg.freeze()
         self.save_current_cfg()
         return self.cfg.graph
 
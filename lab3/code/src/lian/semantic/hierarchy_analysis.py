@@ -69,7 +69,7 @@ class ScopeHierarchy:
 
     def save_results(self):
         semantic_path = self.unit_info.glang_path.replace(f"/{config.GLANG_DIR}/", f"/{config.SEMANTIC_DIR}/")
-        scope_space_path = semantic_path + ".scope_space"
+        scope_space_path = semantic_path + config.SCOPE_SPACE_EXT
         do.DataFrameAgent(self.scope_space, columns = schema.scope_space_schema).save(scope_space_path)
         self.module_symbols.update_scope_space_path_by_glang_path(self.unit_info.glang_path, scope_space_path)
 
@@ -79,7 +79,7 @@ class ScopeHierarchy:
         self.unit_glang = None
         self.stmt_id_to_glang_index = {}
         self.unit_level_id_to_scope = {}
-        self.stmt_id_to_scope_id_cache = {}
+        self.stmt_id_to_scope_id = {}
 
     def analyze_unit(self, unit_info, unit_glang):
         self.reset()
@@ -104,66 +104,63 @@ class ScopeHierarchy:
         return self.unit_glang.access(index)
 
     def determine_scope(self, stmt_id):
-        if stmt_id == 0:
-            return 0
-
-        if stmt_id in self.stmt_id_to_scope_id_cache:
-            return self.stmt_id_to_scope_id_cache[stmt_id]
-
-        stmt = self.access_by_stmt_id(stmt_id)
-        if stmt is None:
-            return 0
-
-        result = stmt.stmt_id
-        if stmt.stmt_id not in self.unit_level_id_to_scope:
-            result = self.determine_scope(stmt.parent_stmt_id)
-
-        self.stmt_id_to_scope_id_cache[stmt_id] = result
-
-        return result
+        """
+        Return the id of the innermost scope containing stmt_id, which is filled by discover()
+        """
+        return self.stmt_id_to_scope_id.get(stmt_id, 0)
 
     def discover(self):
-        counter = 0
+        """
+        One pass over the rows of the unit. The parent of a stmt is always flattened before the stmt, so the scope
+        of the parent is known when the stmt is visited: a stmt opening a scope is its own scope, and any other stmt
+        is in the scope of its parent.
+        """
         self.unit_level_id_to_scope[0] = Scope(self.unit_id, 0, 0, ScopeKind.UNIT_SCOPE)
-        for row in self.unit_glang:
-            self.stmt_id_to_glang_index[row.stmt_id] = counter
-            counter += 1
-
-            if row.operation == "package_stmt":
-                parent_scope_id = self.determine_scope(row.parent_stmt_id)
+        stmt_ids = self.unit_glang.stmt_id.tolist()
+        parent_stmt_ids = self.unit_glang.parent_stmt_id.tolist()
+        operations = self.unit_glang.operation.tolist()
+        names = self.unit_glang.name.tolist()
+        for index in range(len(stmt_ids)):
+            stmt_id = stmt_ids[index]
+            parent_stmt_id = parent_stmt_ids[index]
+            operation = operations[index]
+            self.stmt_id_to_glang_index[stmt_id] = index
+            parent_scope_id = self.determine_scope(parent_stmt_id)
+
+            if operation == "package_stmt":
                 parent_scope = self.unit_level_id_to_scope[parent_scope_id]
-                parent_scope.package_stmts.append(row.stmt_id)
-            elif row.operation in IMPORT_OPERATION:
-                parent_scope_id = self.determine_scope(row.parent_stmt_id)
+                parent_scope.package_stmts.append(stmt_id)
+            elif operation in IMPORT_OPERATION:
                 parent_scope = self.unit_level_id_to_scope[parent_scope_id]
-                parent_scope.import_stmts.append(row.stmt_id)
-            elif row.operation in VARIABLE_DECL_OPERATION:
-                parent_scope_id = self.determine_scope(row.parent_stmt_id)
+                parent_scope.import_stmts.append(stmt_id)
+            elif operation in VARIABLE_DECL_OPERATION:
                 parent_scope = self.unit_level_id_to_scope[parent_scope_id]
-                parent_scope.variable_decls.append(row.stmt_id)
-            elif row.operation in METHOD_DECL_OPERATION:
-                parent_scope_id = self.determine_scope(row.parent_stmt_id)
+                parent_scope.variable_decls.append(stmt_id)
+            elif operation in METHOD_DECL_OPERATION:
                 parent_scope = self.unit_level_id_to_scope[parent_scope_id]
-                parent_scope.method_decls.append((row.stmt_id, row.name))
+                parent_scope.method_decls.append((stmt_id, names[index]))
 
-                self.unit_level_id_to_scope[row.stmt_id] = Scope(
-                    self.unit_id, row.stmt_id, parent_scope_id, ScopeKind.METHOD_SCOPE
+                self.unit_level_id_to_scope[stmt_id] = Scope(
+                    self.unit_id, stmt_id, parent_scope_id, ScopeKind.METHOD_SCOPE
                 )
-            elif row.operation in CLASS_DECL_OPERATION:
-                parent_scope_id = self.determine_scope(row.parent_stmt_id)
+            elif operation in CLASS_DECL_OPERATION:
                 parent_scope = self.unit_level_id_to_scope[parent_scope_id]
-                parent_scope.class_decls.append(row.stmt_id)
+                parent_scope.class_decls.append(stmt_id)
 
-                self.unit_level_id_to_scope[row.stmt_id] = Scope(
-                    self.unit_id, row.stmt_id, parent_scope_id, ScopeKind.CLASS_SCOPE
+                self.unit_level_id_to_scope[stmt_id] = Scope(
+                    self.unit_id, stmt_id, parent_scope_id, ScopeKind.CLASS_SCOPE
                 )
-            elif row.operation == "block_start":
-                final_scope_id = self.determine_scope(row.parent_stmt_id)
-                if final_scope_id not in self.unit_level_id_to_scope:
-                    self.unit_level_id_to_scope[final_scope_id] = Scope(
-                        self.unit_id, row.parent_stmt_id, final_scope_id, ScopeKind.BLOCK_SCOPE
+            elif operation == "block_start":
+                if parent_scope_id not in self.unit_level_id_to_scope:
+                    self.unit_level_id_to_scope[parent_scope_id] = Scope(
+                        self.unit_id, parent_stmt_id, parent_scope_id, ScopeKind.BLOCK_SCOPE
                     )
 
+            if stmt_id in self.unit_level_id_to_scope:
+                self.stmt_id_to_scope_id[stmt_id] = stmt_id
+            else:
+                self.stmt_id_to_scope_id[stmt_id] = parent_scope_id
+
     def display_results(self):
         pprint.pprint(self.unit_level_id_to_scope)
 
@@ -2,7 +2,9 @@
 
 import dataclasses
 import os
+from array import array
 import networkx as nx
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from collections import Counter
@@ -12,6 +14,7 @@ from collections import defaultdict
 from lian.util import util
 from lian.config.constants import (
     BuiltinOrCustomDataType,
+    ControlFlowKind,
     ScopeKind,
     StateKind,
     SymbolOrState
@@ -65,6 +68,25 @@ class InternalAnalysisTemplate:
     def method_analysis(self, previous_results):
         pass
 
+    def method_metrics(self):
+        """
+        Return the counters of the last method_analysis() call, e.g., {"worklist_iterations": 10}, which are
+        written to the metrics output
+        """
+        return {}
+
+    def collect_method_results(self):
+        """
+        Return and clear the rows saved by method_analysis() since the last call, in a worker process
+        """
+        return None
+
+    def merge_method_results(self, results):
+        """
+        Add the rows collected by collect_method_results() in a worker process to the current bundle
+        """
+        pass
+
 class BasicElement:
     def get_id(self):
         pass
@@ -185,15 +207,19 @@ class BasicGraph:
         self.draw_graph()
         plt.show()
 
+    def networkx_graph(self):
+        return self.graph
+
     def draw_graph(self):
         plt.clf()
-        pos = nx.circular_layout(self.graph)
+        graph = self.networkx_graph()
+        pos = nx.circular_layout(graph)
         nx.draw(
-            self.graph, pos, with_labels=True, node_color='skyblue', node_size=700,
+            graph, pos, with_labels=True, node_color='skyblue', node_size=700,
             edge_color='k', linewidths=1, font_size=15, arrows=True
         )
-        edge_labels = dict([((u, v,), d['weight']) for u, v, d in self.graph.edges(data=True)])
-        nx.draw_networkx_edge_labels(self.graph, pos, edge_labels=edge_labels)
+        edge_labels = dict([((u, v,), d['weight']) for u, v, d in graph.edges(data=True)])
+        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels)
 
     def save_png(self, path):
         self.draw_graph()
@@ -403,6 +429,115 @@ class DataTypeGraph(BasicGraph):
     pass
 
 
+class CompactGraph:
+    """
+    A frozen directed graph in CSR form. The nodes are numbered in the order they are first seen in the edges,
+    the successors and the predecessors of each node are contiguous slices of integer arrays, and the kind
+    (weight) of each edge is kept in an array parallel to the successors.
+    It provides the read-only part of the networkx API used by the analyses.
+    """
+    def __init__(self, edges):
+        """
+        edges: [(src_node, dst_node, weight)] without duplicated (src_node, dst_node)
+        """
+        self.node_ids = array("q")
+        self.node_to_index = {}
+        src_indexes = array("q")
+        dst_indexes = array("q")
+        for src, dst, _ in edges:
+            src_indexes.append(self.add_node(src))
+            dst_indexes.append(self.add_node(dst))
+
+        node_count = len(self.node_ids)
+        self.succ_offsets, succ_order = self.build_offsets(src_indexes, node_count)
+        self.pred_offsets, pred_order = self.build_offsets(dst_indexes, node_count)
+        self.succ_ids = array("q", (self.node_ids[dst_indexes[i]] for i in succ_order))
+        self.succ_weights = [edges[i][2] for i in succ_order]
+        self.pred_ids = array("q", (self.node_ids[src_indexes[i]] for i in pred_order))
+
+    def add_node(self, node):
+        index = self.node_to_index.get(node)
+        if index is None:
+            index = len(self.node_ids)
+            self.node_to_index[node] = index
+            self.node_ids.append(node)
+        return index
+
+    @staticmethod
+    def build_offsets(node_indexes, node_count):
+        """
+        Counting sort of the edges by node_indexes, which keeps the order of the edges of the same node.
+        Return (offsets, edge order), where the edges of node i are edge order[offsets[i]:offsets[i + 1]]
+        """
+        offsets = array("q", bytes(8 * (node_count + 1)))
+        for index in node_indexes:
+            offsets[index + 1] += 1
+        for i in range(node_count):
+            offsets[i + 1] += offsets[i]
+
+        positions = array("q", offsets)
+        order = array("q", bytes(8 * len(node_indexes)))
+        for edge_index, index in enumerate(node_indexes):
+            order[positions[index]] = edge_index
+            positions[index] += 1
+        return (offsets, order)
+
+    def __contains__(self, node):
+        return node in self.node_to_index
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def nodes(self):
+        return list(self.node_ids)
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.succ_ids)
+
+    def successors(self, node):
+        index = self.node_to_index.get(node)
+        if index is None:
+            return ()
+        return self.succ_ids[self.succ_offsets[index]: self.succ_offsets[index + 1]]
+
+    def predecessors(self, node):
+        index = self.node_to_index.get(node)
+        if index is None:
+            return ()
+        return self.pred_ids[self.pred_offsets[index]: self.pred_offsets[index + 1]]
+
+    def out_degree(self, node):
+        index = self.node_to_index.get(node)
+        if index is None:
+            return 0
+        return self.succ_offsets[index + 1] - self.succ_offsets[index]
+
+    def in_degree(self, node):
+        index = self.node_to_index.get(node)
+        if index is None:
+            return 0
+        return self.pred_offsets[index + 1] - self.pred_offsets[index]
+
+    def edges(self, data = None, default = None):
+        for index in range(len(self.node_ids)):
+            src = self.node_ids[index]
+            for edge_index in range(self.succ_offsets[index], self.succ_offsets[index + 1]):
+                if data is None:
+                    yield (src, self.succ_ids[edge_index])
+                else:
+                    weight = self.succ_weights[edge_index]
+                    yield (src, self.succ_ids[edge_index], default if weight is None else weight)
+
+    def to_networkx(self):
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.node_ids)
+        for src, dst, weight in self.edges(data = "weight"):
+            graph.add_edge(src, dst, weight = weight)
+        return graph
+
 class CFGNode:
     def __init__(self, stmt, edge = None):
         self.stmt = stmt
@@ -415,7 +550,10 @@ class ControlFlowGraph(BasicGraph):
         self.unit_id = unit_info.symbol_id
         self.method_id = method_stmt.stmt_id
 
-        self.graph = nx.MultiDiGraph()
+        # the edges are collected as [src, dst, weight], and frozen into a CompactGraph by freeze()
+        self.edge_list = []
+        self.edge_to_index = {}
+        self.graph = None
 
     def add_edge(self, src_stmt, dst_stmt, control_flow_type = None):
         if isinstance(src_stmt, CFGNode):
@@ -423,6 +561,32 @@ class ControlFlowGraph(BasicGraph):
         else:
             super().add_edge(src_stmt, dst_stmt, control_flow_type)
 
+    def _add_one_edge(self, src_stmt_id, dst_stmt_id, weight):
+        if src_stmt_id == dst_stmt_id:
+            return
+        if src_stmt_id < 0:
+            return
+        if config.DEBUG_FLAG:
+            util.debug(f"_add_one_edge:{src_stmt_id}->{dst_stmt_id}, weight={weight}")
+
+        edge = (src_stmt_id, dst_stmt_id)
+        index = self.edge_to_index.get(edge)
+        if index is None:
+            self.edge_to_index[edge] = len(self.edge_list)
+            self.edge_list.append([src_stmt_id, dst_stmt_id, weight])
+        else:
+            # multiple edges between two stmts are replaced with a single empty one
+            self.edge_list[index][2] = ControlFlowKind.EMPTY
+
+    def freeze(self):
+        self.graph = CompactGraph(self.edge_list)
+        self.edge_list = []
+        self.edge_to_index = {}
+        return self.graph
+
+    def networkx_graph(self):
+        return self.graph.to_networkx()
+
 
 @dataclasses.dataclass
 class State(BasicElement):
@@ -609,11 +773,23 @@ class BitVectorManager:
     counter: int = 0
     stmt_to_bit_pos: dict = dataclasses.field(default_factory=dict)
     bit_pos_to_stmt: dict = dataclasses.field(default_factory=dict)
+    # precomputed by init()
+    stmt_to_gen_mask: dict = dataclasses.field(default_factory=dict)
+    symbol_to_kill_mask: dict = dataclasses.field(default_factory=dict)
+    bit_pos_array: np.ndarray = None
 
-    def init(self, stmt_list):
+    def init(self, stmt_list, symbol_to_def_stmts = None):
         for stmt_id in stmt_list:
             self.add_stmt(stmt_id)
 
+        self.bit_pos_array = np.array(stmt_list, dtype = np.int64)
+        for stmt_id, bit_pos in self.stmt_to_bit_pos.items():
+            self.stmt_to_gen_mask[stmt_id] = 1 << bit_pos
+
+        if symbol_to_def_stmts:
+            for name, def_stmts in symbol_to_def_stmts.items():
+                self.symbol_to_kill_mask[name] = self.stmts_to_mask(def_stmts)
+
     def to_dict(self, unit_id, method_id):
         results = []
         for bit_pos, stmt in self.bit_pos_to_stmt.items():
@@ -635,6 +811,9 @@ class BitVectorManager:
 
     # find all 1s -> stmt_id
     def explain(self, bit_vector):
+        if bit_vector.bit_length() > config.BIT_VECTOR_NUMPY_DECODE_WIDTH and self.bit_pos_array is not None:
+            return self.explain_wide(bit_vector)
+
         result = set()
         # still remain 1
         while bit_vector:
@@ -647,28 +826,41 @@ class BitVectorManager:
             bit_vector = next_bit_vector
         return result
 
-    def kill_stmts(self, bit_vector, stmts):
-        # TODO 实现kill,获取stmt对应的bit_pos，通过位操作更新bit_vector
+    def explain_wide(self, bit_vector):
+        """
+        Decode all the bits at once with numpy, which is faster for the vectors with many 1s
+        """
+        raw_bytes = bit_vector.to_bytes((bit_vector.bit_length() + 7) // 8, "little")
+        bits = np.unpackbits(np.frombuffer(raw_bytes, dtype = np.uint8), bitorder = "little")
+        bit_positions = np.flatnonzero(bits)
+        return set(self.bit_pos_array[bit_positions].tolist())
 
+    def stmts_to_mask(self, stmts):
         mask = 0
         for stmt_id in stmts:
             pos = self.find_bit_pos_by_stmt(stmt_id)
             if pos >= 0:
                 mask |= (1 << pos)
+        return mask
+
+    def gen_mask_of_stmt(self, stmt_id):
+        return self.stmt_to_gen_mask.get(stmt_id, 0)
+
+    def kill_mask_of_symbol(self, name):
+        return self.symbol_to_kill_mask.get(name, 0)
+
+    def kill_stmts(self, bit_vector, stmts):
         # clear those bits
-        return bit_vector & ~mask
+        return bit_vector & ~self.stmts_to_mask(stmts)
 
     def gen_stmts(self, bit_vector, stmts):
-        # TODO 实现gen,获取stmt对应的bit_pos，通过位操作更新bit_vector
-        
-        mask = 0
-        for stmt_id in stmts:
-            pos = self.find_bit_pos_by_stmt(stmt_id)
-            if pos >= 0:
-                mask |= (1 << pos)
-        return bit_vector | mask
+        return bit_vector | self.stmts_to_mask(stmts)
 
+    def kill_symbol(self, bit_vector, name):
+        return bit_vector & ~self.kill_mask_of_symbol(name)
 
+    def gen_stmt(self, bit_vector, stmt_id):
+        return bit_vector | self.gen_mask_of_stmt(stmt_id)
 
     def is_stmt_alive(self, bit_vector, stmt_id):
         bit_pos = self.stmt_to_bit_pos.get(stmt_id)
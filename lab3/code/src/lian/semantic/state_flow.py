@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import heapq
 import logging
 import os
 import networkx as nx
@@ -86,6 +87,22 @@ class StateFlowAnalysis(InternalAnalysisTemplate):
             symbol_dependency_graph_png_path = semantic_path + "_sdg.png"
             self.symbol_dependency_graph.save_png(symbol_dependency_graph_png_path)
 
+    def collect_method_results(self):
+        results = (self.all_sdg_edges, self.all_status, self.all_symbols_and_states)
+        self.all_sdg_edges = []
+        self.all_status = []
+        self.all_symbols_and_states = []
+        return results
+
+    def merge_method_results(self, results):
+        sdg_edges, status, symbols_and_states = results
+        self.all_sdg_edges.extend(sdg_edges)
+        self.all_status.extend(status)
+        self.all_symbols_and_states.extend(symbols_and_states)
+
+    def method_metrics(self):
+        return {"worklist_iterations": self.reaching_iterations}
+
     def unit_analysis_start(self):
         pass
 
@@ -137,6 +154,7 @@ class StateFlowAnalysis(InternalAnalysisTemplate):
         self.stmt_to_status = {}
         self.symbol_to_def_stmts = {}
         self.stmt_counters = {}
+        self.reaching_iterations = 0
 
         self.stmt_def_use_analysis = StmtDefUseAnalysis(
             self.symbol_to_def_stmts,
@@ -188,7 +206,7 @@ class StateFlowAnalysis(InternalAnalysisTemplate):
             symbol = self.symbol_state_space[defined_symbol_index]
             if util.is_available(symbol):
                 defs.append(stmt_id)
-        self.bit_vector_manager.init(defs)
+        self.bit_vector_manager.init(defs, self.symbol_to_def_stmts)
 
     def sync_symbol_id(self, defined_symbol, target_stmts):
         if defined_symbol is None:
@@ -212,59 +230,103 @@ class StateFlowAnalysis(InternalAnalysisTemplate):
             # self.symbol_id_to_name[common_id] = target_defined_symbol.name
 
 
+    def init_kill_gen_masks(self):
+        """
+        Return {stmt_id: (kill_mask, gen_mask)} of the stmts defining a symbol
+        """
+        stmt_to_kill_gen = {}
+        for stmt_id, status in self.stmt_to_status.items():
+            defined_symbol_index = status.defined_symbol
+            if defined_symbol_index == -1:
+                continue
+            defined_symbol = self.symbol_state_space[defined_symbol_index]
+            if not isinstance(defined_symbol, Symbol):
+                continue
+
+            stmt_to_kill_gen[stmt_id] = (
+                self.bit_vector_manager.kill_mask_of_symbol(defined_symbol.name),
+                self.bit_vector_manager.gen_mask_of_stmt(stmt_id)
+            )
+        return stmt_to_kill_gen
+
     @profile
     def reaching_symbol_analysis(self):
-       
-        worklist = list(self.stmt_to_status.keys())
-        while len(worklist) != 0:
-            stmt_id = worklist.pop(0)
-            if stmt_id not in self.stmt_to_status:
-                continue
+        """
+        Solve reaching definitions with a worklist ordered by the reverse postorder of the CFG
+        """
+        stmt_to_order = util.cfg_reverse_postorder(self.cfg, list(self.stmt_to_status.keys()))
+        stmt_to_kill_gen = self.init_kill_gen_masks()
+
+        predecessors = {}
+        successors = {}
+        for stmt_id in self.stmt_to_status:
+            predecessors[stmt_id] = []
+            for parent_stmt_id in self.cfg.predecessors(stmt_id):
+                if parent_stmt_id in self.stmt_to_status:
+                    predecessors[stmt_id].append(parent_stmt_id)
+            successors[stmt_id] = []
+            for child_stmt_id in self.cfg.successors(stmt_id):
+                if child_stmt_id in self.stmt_to_status:
+                    successors[stmt_id].append(child_stmt_id)
+
+        worklist = []
+        in_worklist = set()
+        for stmt_id in self.stmt_to_status:
+            heapq.heappush(worklist, (stmt_to_order[stmt_id], stmt_id))
+            in_worklist.add(stmt_id)
+
+        iterations = 0
+        while worklist:
+            stmt_id = heapq.heappop(worklist)[1]
+            in_worklist.discard(stmt_id)
+            iterations += 1
+
             status = self.stmt_to_status[stmt_id]
             old_outs = status.out_bits
 
-            status.in_bits = 0
-            for parent_stmt_id in self.cfg.predecessors(stmt_id):
-                if parent_stmt_id in self.stmt_to_status:
-                    parent_out_bits = self.stmt_to_status[parent_stmt_id].out_bits
-                    # TODO task1 根据cfg准备并设置status.in_bits
+            # in_bits = merge all out_bits of parent cfg
+            in_bits = 0
+            for parent_stmt_id in predecessors[stmt_id]:
+                in_bits |= self.stmt_to_status[parent_stmt_id].out_bits
+            status.in_bits = in_bits
 
-                    # in_bits = merge all out_bits of parent cfg
-                    status.in_bits |= parent_out_bits
+            # kill-gen on the def of the current stmt
+            kill_gen = stmt_to_kill_gen.get(stmt_id)
+            if kill_gen is None:
+                status.out_bits = in_bits
+            else:
+                status.out_bits = (in_bits & ~kill_gen[0]) | kill_gen[1]
 
-            status.out_bits = status.in_bits
-            # if current stmt has def
-            defined_symbol_index = status.defined_symbol
-            if defined_symbol_index != -1:
-                defined_symbol = self.symbol_state_space[defined_symbol_index]
-                if isinstance(defined_symbol, Symbol):
-                    # TODO task2 根据当前defined_symbol的all_def_stmts,通过self.bit_vector_manager,应用kill-gen算法对status.out_bits进行更新
-                    
-                    # name = defined_symbol.name
-                    # defs_to_kill = list(self.symbol_to_def_stmts.get(name, []))
-                    all_def_stmts = self.symbol_to_def_stmts[defined_symbol.name]
-                    print("\n")
-                    print(all_def_stmts)
-                    print("\n")
-                    status.out_bits = self.bit_vector_manager.kill_stmts(status.out_bits, all_def_stmts)
-                    status.out_bits = self.bit_vector_manager.gen_stmts(status.out_bits, [stmt_id])
-            
-            # TODO task3 通过判断out_bits是否变化来判断是否到达不动点
             if status.out_bits != old_outs:
-                worklist = util.merge_list(worklist, list(self.cfg.successors(stmt_id)))
+                for child_stmt_id in successors[stmt_id]:
+                    if child_stmt_id not in in_worklist:
+                        heapq.heappush(worklist, (stmt_to_order[child_stmt_id], child_stmt_id))
+                        in_worklist.add(child_stmt_id)
+
+        self.reaching_iterations = iterations
+        if self.options.debug:
+            util.debug(f"reaching_symbol_analysis: method {self.method_id}, {len(self.stmt_to_status)} stmts, {iterations} iterations")
+
+    def find_reachable_defs(self, in_bits, used_name):
+        """
+        AND in_bits with the def mask of used_name, so only the surviving bits are decoded
+        """
+        def_mask = self.bit_vector_manager.kill_mask_of_symbol(used_name)
+        return self.bit_vector_manager.explain(in_bits & def_mask)
 
+    @profile
     def construct_symbol_dependency_graph(self):
         for stmt_id in self.stmt_to_status:
             status = self.stmt_to_status[stmt_id]
+            # used_name -> reachable defs of this stmt
+            stmt_reachable_defs = {}
             for used_symbol_id in status.used_symbols:
                 used_symbol = self.symbol_state_space[used_symbol_id]
                 if isinstance(used_symbol, Symbol):
                     used_name = used_symbol.name
-                    reaching_defs = self.bit_vector_manager.explain(status.in_bits)
-                    if used_name in self.symbol_to_def_stmts:
-                        reachable_defs = reaching_defs & self.symbol_to_def_stmts[used_name]
-                    else:
-                        reachable_defs = []
+                    if used_name not in stmt_reachable_defs:
+                        stmt_reachable_defs[used_name] = self.find_reachable_defs(status.in_bits, used_name)
+                    reachable_defs = stmt_reachable_defs[used_name]
                     # print(f"construct_symbol_dependency_graph@ 可到达词条语句的def stmt有：{reachable_defs}")
                     for def_stmt_id in reachable_defs:
                         reaching_status = self.stmt_to_status[def_stmt_id]
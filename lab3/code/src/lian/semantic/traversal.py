@@ -1,21 +1,56 @@
 #!/usr/bin/env python3
 
+import os
+import time
+from multiprocessing import Pool
+
 from lian.util import util
 from lian.util import dataframe_operation as do
-from lian.config.constants import SymbolKind, EventKind
+from lian.config.constants import SymbolKind, EventKind, AnalysisPhaseName
 from lian.config import config, schema
+from lian.lang import storage
 from lian.semantic import (
     hierarchy_analysis,
     control_flow,
     state_flow
 )
 
+worker_traversal = None
+
+def init_worker(options, module_symbols):
+    global worker_traversal
+    config.DEBUG_FLAG = options.debug
+    config.METRICS_FLAG = bool(options.metrics)
+    # drop the metrics copied from the parent process
+    util.take_metrics()
+    worker_traversal = InternalTraversal(options, module_symbols)
+    worker_traversal.init_analysis_phases()
+    worker_traversal.phase_internal_analysis_start()
+    worker_traversal.phase_bundle_start(None)
+
+def method_analysis_worker(method_task):
+    return (worker_traversal.analyze_method_task(method_task), util.take_metrics())
+
+def bundle_analysis_worker(bundle_path):
+    return (worker_traversal.analyze_bundle_task(bundle_path), util.take_metrics())
+
+def block_data(block):
+    if block is None:
+        return None
+    return block._data
+
+def block_data_model(data):
+    if data is None:
+        return None
+    return do.DataFrameAgent(data)
+
 class InternalTraversal:
     def __init__(self, options, module_symbols):
         self.analysis_phases = []
         self.options = options
         self.module_symbols = module_symbols
         self.module_symbol_table = module_symbols.module_symbol_table
+        self.unit_counter = 0
         # self.type_system = type_system.TypeSystem()
 
         self.analysis_phases = [
@@ -35,41 +70,44 @@ class InternalTraversal:
 
     def phase_internal_analysis_start(self):
         for phase in self.analysis_phases:
-            phase.internal_analysis_start()
+            with util.measure_phase(phase.name + ".internal_analysis_start"):
+                phase.internal_analysis_start()
 
     def phase_internal_analysis_end(self):
         for phase in self.analysis_phases:
-            phase.internal_analysis_end()
+            with util.measure_phase(phase.name + ".internal_analysis_end"):
+                phase.internal_analysis_end()
 
     def phase_bundle_start(self, bundle_path):
         for phase in self.analysis_phases:
             phase.bundle_path = bundle_path
-            phase.bundle_start()
+            with util.measure_phase(phase.name + ".bundle_start"):
+                phase.bundle_start()
 
     def phase_bundle_end(self):
         for phase in self.analysis_phases:
-            phase.bundle_end()
+            with util.measure_phase(phase.name + ".bundle_end"):
+                phase.bundle_end()
             phase.bundle_path = None
 
     def phase_unit_start(self, scope_hierarchy, unit_info, unit_glang):
         for phase in self.analysis_phases:
-            phase.scope_hierarchy = scope_hierarchy
-            phase.unit_info = unit_info
-            phase.unit_id = unit_info.symbol_id
-            phase.unit_glang = unit_glang
-            phase.lang = unit_info.lang
-
-            phase.unit_analysis_start()
+            self.phase_unit_init(phase, scope_hierarchy, unit_info, unit_glang)
+            with util.measure_phase(phase.name + ".unit_analysis_start"):
+                phase.unit_analysis_start()
 
     def phase_unit_end(self):
         for phase in self.analysis_phases:
-            phase.unit_analysis_end()
+            with util.measure_phase(phase.name + ".unit_analysis_end"):
+                phase.unit_analysis_end()
+            self.phase_unit_init(phase, None, None, None)
 
-            phase.scope_hierarchy = None
-            phase.unit_info = None
-            phase.unit_glang = None
-            phase.unit_id = -1
-            phase.lang = None
+    def phase_unit_init(self, phase, scope_hierarchy, unit_info, unit_glang):
+        phase.scope_hierarchy = scope_hierarchy
+        phase.unit_info = unit_info
+        phase.unit_id = -1 if unit_info is None else unit_info.symbol_id
+        phase.unit_glang = unit_glang
+        phase.lang = None if unit_info is None else unit_info.lang
 
     def phase_method_init(self, phase, method_stmt, parameter_decls, method_init, method_body):
         phase.method_stmt = method_stmt
@@ -78,6 +116,94 @@ class InternalTraversal:
         phase.method_init = method_init
         phase.method_body = method_body
 
+    def load_unit_index(self, bundle, bundle_path):
+        """
+        Return [(unit_id, start_row, end_row)] of the bundle, read from the index saved by the Exporter
+        """
+        unit_index_path = bundle_path + config.UNIT_INDEX_EXT
+        if os.path.exists(unit_index_path):
+            unit_index = do.DataFrameAgent().load(unit_index_path)
+        else:
+            unit_index = do.DataFrameAgent(
+                storage.build_unit_index(bundle.column_values("unit_id")), columns = schema.unit_index_schema
+            )
+
+        results = []
+        for row in unit_index:
+            results.append((row.unit_id, row.start_row, row.end_row))
+        return results
+
+    def analyze_method(self, method_stmt, method_parameters, method_init, method_body):
+        method_metrics = {
+            "unit_id"   : int(method_stmt.unit_id),
+            "name"      : method_stmt.name,
+            "stmts"     : 0,
+        }
+        for block in (method_parameters, method_init, method_body):
+            if util.is_available(block):
+                method_metrics["stmts"] += len(block)
+
+        previous_results = {}
+        for index, phase in enumerate(self.analysis_phases):
+            if self.options.debug:
+                util.debug(f"analysis_phase name: {phase.name} index:{index}")
+
+            self.phase_method_init(phase, method_stmt, method_parameters, method_init, method_body)
+            start_time = time.perf_counter()
+            last_result = phase.method_analysis(previous_results)
+            used_time = time.perf_counter() - start_time
+            util.add_phase_metrics(phase.name + ".method_analysis", used_time)
+            method_metrics[phase.name + "_seconds"] = used_time
+            method_metrics.update(phase.method_metrics())
+            previous_results[phase.name] = last_result
+
+        util.add_method_metrics(method_stmt.stmt_id, method_metrics)
+
+    def analyze_method_task(self, method_task):
+        """
+        Analyze one method in a worker process, and return the rows saved by each phase. The unit hooks are called
+        by the main process, so only the unit of the method is set on the phases.
+        """
+        unit_info, method_stmt, method_parameters, method_init, method_body = method_task
+        for phase in self.analysis_phases:
+            self.phase_unit_init(phase, None, unit_info, None)
+        self.analyze_method(
+            method_stmt,
+            block_data_model(method_parameters),
+            block_data_model(method_init),
+            block_data_model(method_body)
+        )
+        results = [phase.collect_method_results() for phase in self.analysis_phases]
+        for phase in self.analysis_phases:
+            self.phase_unit_init(phase, None, None, None)
+        return results
+
+    def analyze_bundle_task(self, bundle_path):
+        """
+        Analyze one bundle in a worker process, and return the path updates of module_symbol_table
+        """
+        self.analyze_bundle(bundle_path)
+        # clear the rows of the phases for the next method task
+        self.phase_bundle_start(None)
+        return self.module_symbols.take_path_updates()
+
+    def submit_method_tasks(self, pool, method_tasks):
+        """
+        Queue method_tasks on the pool, and return the iterator of their results in the order of method_tasks
+        """
+        chunksize = max(1, len(method_tasks) // (self.options.cores * config.METHOD_TASKS_PER_CORE))
+        return pool.imap(method_analysis_worker, method_tasks, chunksize)
+
+    def merge_method_task_results(self, all_results):
+        """
+        Gather the results of the workers in the order of the method tasks, so that the bundle is the same as the
+        one analyzed method by method
+        """
+        for results, metrics in all_results:
+            util.merge_metrics(metrics)
+            for phase, phase_results in zip(self.analysis_phases, results):
+                phase.merge_method_results(phase_results)
+
     @profile
     def run(self):
         """
@@ -88,51 +214,162 @@ class InternalTraversal:
         Procedures:
         - traversal all units in glang_bundles
         - call each phase for each unit and its glang IR
+        - with more than one core, the methods of each bundle are analyzed by a process pool
         """
         self.init_analysis_phases()
         self.phase_internal_analysis_start()
 
-        tmp_counter = 0
+        pool = None
+        # the debug outputs of the phases are only available in the current process
+        if self.options.cores > 1:
+            if self.options.debug:
+                util.warn(f"The semantic phase runs on one core in the DEBUG mode, ignoring -c {self.options.cores}")
+            else:
+                pool = Pool(self.options.cores, initializer = init_worker, initargs = (self.options, self.module_symbols))
+
+        try:
+            self.analyze_bundles(pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def count_bundle_rows(self, bundle_path):
+        bundle = do.MappedTable(bundle_path)
+        row_count = len(bundle)
+        bundle.close()
+        return row_count
+
+    def schedule_bundles(self, bundle_paths):
+        """
+        Sort the bundles by row count, the largest first. The bundles with more rows than an even share of the
+        cores are analyzed method by method, so that they do not leave the other cores idle, and the others are
+        analyzed bundle by bundle after them. Return (large_bundles, small_bundles).
+        """
+        row_counts = {}
+        for bundle_path in bundle_paths:
+            row_counts[bundle_path] = self.count_bundle_rows(bundle_path)
+        sorted_paths = sorted(bundle_paths, key = lambda bundle_path: row_counts[bundle_path], reverse = True)
+
+        share = sum(row_counts.values()) / self.options.cores
+        large_bundles = []
+        small_bundles = []
+        for bundle_path in sorted_paths:
+            if row_counts[bundle_path] > share:
+                large_bundles.append(bundle_path)
+            else:
+                small_bundles.append(bundle_path)
+        return (large_bundles, small_bundles)
+
+    def analyze_bundles(self, pool):
+        bundle_paths = []
         for bundle_path in self.module_symbol_table.unique_values_of_column("glang_path"):
-            bundle = do.DataFrameAgent().load(bundle_path)
-            unit_id_set = bundle.unique_values_of_column("unit_id")
-            scope_hierarchy = hierarchy_analysis.ScopeHierarchy(self.module_symbols)
-            self.phase_bundle_start(bundle_path)
-            for unit_id in unit_id_set:
-                if self.options.benchmark:
-                    tmp_counter += 1
-                    if tmp_counter >= config.MAX_BENCHMARK_TARGET:
-                        return
-
-                unit_info = self.module_symbols.find_unit_by_id(unit_id)
-                unit_glang = bundle.query(bundle.unit_id == unit_id, reset_index = True)
-                scope_hierarchy.analyze_unit(unit_info, unit_glang)
-                self.phase_unit_start(scope_hierarchy, unit_info, unit_glang)
-                all_method_stmt_ids = []
-                for method_stmt in scope_hierarchy.get_all_methods_of_current_unit():
-                    method_stmt = unit_glang.query_first(unit_glang.stmt_id == method_stmt.stmt_id)
-                    all_method_stmt_ids.append(method_stmt.stmt_id)
-                    if not method_stmt:
-                        continue
-
-                    method_parameters = unit_glang.read_block(method_stmt.parameters, reset_index = True)
-                    method_init = unit_glang.read_block(method_stmt.init, reset_index = True)
-                    method_body = unit_glang.read_block(method_stmt.body, reset_index = True)
-
-                    # TODO: spawn _THREAD_ to launch self.method_analysis()
-                    previous_results = {}
-                    for index, phase in enumerate(self.analysis_phases):
-                        if self.options.debug:
-                            util.debug(f"analysis_phase name: {phase.name} index:{index}")
-                            
-                        self.phase_method_init(phase, method_stmt, method_parameters, method_init, method_body)
-                        last_result = phase.method_analysis(previous_results)
-                        previous_results[phase.name] = last_result
-
-                self.phase_unit_end()
-
-            scope_hierarchy.save_results()
-            self.phase_bundle_end()
+            if bundle_path not in self.module_symbols.reused_glang_paths:
+                bundle_paths.append(bundle_path)
+
+        # the benchmark limit counts the units over all bundles, so the bundles are analyzed in order
+        if pool is None or self.options.benchmark or len(bundle_paths) < 2:
+            for bundle_path in bundle_paths:
+                if not self.analyze_bundle(bundle_path, pool):
+                    return
+        else:
+            large_bundles, small_bundles = self.schedule_bundles(bundle_paths)
+            # the method tasks of all the large bundles are queued before the small bundles, and the results of
+            # each large bundle are merged after that
+            all_method_results = []
+            for bundle_path in large_bundles:
+                all_method_results.append(self.queue_method_tasks(bundle_path, pool))
+            all_path_updates = pool.imap_unordered(bundle_analysis_worker, small_bundles)
+            for bundle_path, method_results in zip(large_bundles, all_method_results):
+                self.analyze_bundle(bundle_path, pool, method_results)
+            for path_updates, metrics in all_path_updates:
+                self.module_symbols.merge_path_updates(path_updates)
+                util.merge_metrics(metrics)
 
         self.phase_internal_analysis_end()
         self.module_symbols.export()
+
+    def analyze_bundle(self, bundle_path, pool = None, method_results = None):
+        """
+        Return False if the benchmark limit is reached. method_results are the results of the method tasks queued
+        by queue_method_tasks() for the bundle, which are merged instead of analyzing the methods.
+        """
+        bundle = do.MappedTable(bundle_path)
+        unit_index = self.load_unit_index(bundle, bundle_path)
+        scope_hierarchy = hierarchy_analysis.ScopeHierarchy(self.module_symbols)
+        self.phase_bundle_start(bundle_path)
+        method_tasks = []
+        for unit_id, start_row, end_row in unit_index:
+            if self.options.benchmark:
+                self.unit_counter += 1
+                if self.unit_counter >= config.MAX_BENCHMARK_TARGET:
+                    return False
+
+            unit_info, unit_glang = self.analyze_unit_scope(bundle, scope_hierarchy, unit_id, start_row, end_row)
+            self.phase_unit_start(scope_hierarchy, unit_info, unit_glang)
+            if method_results is None:
+                method_tasks.extend(self.analyze_unit_methods(scope_hierarchy, unit_info, unit_glang, pool))
+            self.phase_unit_end()
+
+        if len(method_tasks) > 0:
+            method_results = self.submit_method_tasks(pool, method_tasks)
+        if method_results is not None:
+            self.merge_method_task_results(method_results)
+
+        scope_hierarchy.save_results()
+        self.phase_bundle_end()
+        bundle.close()
+        return True
+
+    def queue_method_tasks(self, bundle_path, pool):
+        """
+        Find the methods of the bundle with the scopes of its units, and queue them on pool. The hooks of the phases
+        are not called, since analyze_bundle() analyzes the scopes again with them when the results are merged.
+        """
+        bundle = do.MappedTable(bundle_path)
+        scope_hierarchy = hierarchy_analysis.ScopeHierarchy(self.module_symbols)
+        method_tasks = []
+        for unit_id, start_row, end_row in self.load_unit_index(bundle, bundle_path):
+            unit_info, unit_glang = self.analyze_unit_scope(bundle, scope_hierarchy, unit_id, start_row, end_row)
+            method_tasks.extend(self.analyze_unit_methods(scope_hierarchy, unit_info, unit_glang, pool))
+        bundle.close()
+        return self.submit_method_tasks(pool, method_tasks)
+
+    def analyze_unit_scope(self, bundle, scope_hierarchy, unit_id, start_row, end_row):
+        unit_info = self.module_symbols.find_unit_by_id(unit_id)
+        unit_glang = bundle.slice(start_row, end_row)
+        start_time = time.perf_counter()
+        scope_hierarchy.analyze_unit(unit_info, unit_glang)
+        used_time = time.perf_counter() - start_time
+        util.add_phase_metrics(AnalysisPhaseName.ScopeHierarchy, used_time)
+        util.add_unit_metrics(unit_id, {"path": unit_info.unit_path, "scope_hierarchy_seconds": used_time})
+        return (unit_info, unit_glang)
+
+    def analyze_unit_methods(self, scope_hierarchy, unit_info, unit_glang, pool = None):
+        """
+        Analyze the methods of the current unit of scope_hierarchy without pool, and return them as method tasks
+        with pool
+        """
+        method_tasks = []
+        all_method_stmt_ids = []
+        for method_stmt in scope_hierarchy.get_all_methods_of_current_unit():
+            method_stmt = unit_glang.query_first(unit_glang.stmt_id == method_stmt.stmt_id)
+            all_method_stmt_ids.append(method_stmt.stmt_id)
+            if not method_stmt:
+                continue
+
+            method_parameters = unit_glang.read_block(method_stmt.parameters, reset_index = True)
+            method_init = unit_glang.read_block(method_stmt.init, reset_index = True)
+            method_body = unit_glang.read_block(method_stmt.body, reset_index = True)
+
+            if pool is None:
+                self.analyze_method(method_stmt, method_parameters, method_init, method_body)
+            else:
+                method_tasks.append((
+                    unit_info,
+                    method_stmt,
+                    block_data(method_parameters),
+                    block_data(method_init),
+                    block_data(method_body)
+                ))
+        return method_tasks
@@ -2,10 +2,44 @@
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 from lian.config import config
 from . import util
 
+INT_TYPES_MAPPER = {
+    pa.int64(): pd.Int64Dtype(),
+}
+
+class MappedTable:
+    """
+    An arrow IPC (feather) file read through a memory map. The rows stay in the arrow buffers, which are zero-copy
+    for the uncompressed files, and only the slices that are accessed are converted to DataFrameAgent.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._source = pa.memory_map(path, "r")
+        self._table = pa.ipc.open_file(self._source).read_all()
+
+    def __len__(self):
+        return self._table.num_rows
+
+    def is_empty(self):
+        return self._table.num_rows == 0
+
+    def column_values(self, column_name):
+        return self._table.column(column_name).to_numpy()
+
+    @profile
+    def slice(self, start_row, end_row):
+        # the integer columns keep their nulls as pd.NA instead of turning into float
+        data = self._table.slice(start_row, end_row - start_row).to_pandas(types_mapper = INT_TYPES_MAPPER.get)
+        return DataFrameAgent(data, reset_index = True)
+
+    def close(self):
+        self._table = None
+        self._source.close()
+
 class DataFrameAgent:
     @profile
     def __init__(self, data = None, columns = None, reset_index = False):
@@ -14,6 +48,8 @@ class DataFrameAgent:
         self._reset_index = reset_index
         self._schema = {}
         self._schema_list = []
+        # the Row class specialized for self._schema
+        self._row_class = Row
         self._row_cache = []
         self._column_cache = {}
         self._column_name_cache = set()
@@ -22,6 +58,11 @@ class DataFrameAgent:
         self._need_refresh_rows = True
         self._need_refresh_columns = True
 
+        # block_id -> (start_row, end_row), which is shared with the slices of this data model
+        self._block_index = None
+        self._block_offset = 0
+        self._need_refresh_blocks = True
+
         if data is None:
             return
 
@@ -32,6 +73,7 @@ class DataFrameAgent:
             self._row_cache = data._row_cache
             self._schema_list = data._schema_list
             self._schema = data._schema
+            self._row_class = data._row_class
         else:
             if columns is not None:
                 if isinstance(columns, dict):
@@ -59,17 +101,26 @@ class DataFrameAgent:
         return self.query(item)
 
     def __getattr__(self, column_name):
+        # special names are never columns, e.g., the ones looked up by pickle
+        if column_name.startswith("__"):
+            raise AttributeError(column_name)
         return self.column(column_name)
 
+    def __getstate__(self):
+        return {"data": self._data, "columns": self._columns}
+
+    def __setstate__(self, state):
+        self.__init__(state["data"], state["columns"])
+
     @profile
     def __iter__(self):
         self.refresh_schema()
         self.refresh_rows()
 
-        counter = 0
-        for row in self._row_cache:
-            yield Row(row, self._schema, self._data.index[counter])
-            counter += 1
+        row_class = self._row_class
+        schema = self._schema
+        for row, index in zip(self._row_cache, self._data.index):
+            yield row_class(row, schema, index)
 
     def __len__(self):
         return len(self._data.index)
@@ -103,6 +154,7 @@ class DataFrameAgent:
         self._schema = {}
         for i in range(len(current_schema_list)):
             self._schema[current_schema_list[i]] = i
+        self._row_class = specialize_row_class(self._schema)
 
     @profile
     def refresh_columns(self, column_name):
@@ -143,6 +195,7 @@ class DataFrameAgent:
         self._data = pd.read_feather(path)
         self._need_refresh_schema = True
         self._need_refresh_rows = True
+        self._need_refresh_blocks = True
         self._need_refresh_columns = True
         return self
 
@@ -159,12 +212,28 @@ class DataFrameAgent:
         self.refresh_schema()
         self.refresh_rows()
         if row_index >= 0 and row_index < len(self._row_cache):
-            return Row(self._row_cache[row_index], self._schema, self._data.index[row_index])
+            return self._row_class(self._row_cache[row_index], self._schema, self._data.index[row_index])
         return None
 
     @profile
     def slice(self, start_index, end_index):
-        return DataFrameAgent(self._data.iloc[start_index: end_index], columns = self._schema_list)
+        result = DataFrameAgent(self._data.iloc[start_index: end_index], columns = self._schema_list)
+        if start_index < 0 or end_index < start_index:
+            return result
+
+        # share the row cache and the block index with the slice instead of rebuilding them
+        if not self._need_refresh_rows and not self._need_refresh_schema:
+            result._row_cache = self._row_cache[start_index: end_index]
+            result._schema = self._schema
+            result._row_class = self._row_class
+            result._need_refresh_rows = False
+            result._need_refresh_schema = False
+
+        if not self._need_refresh_blocks:
+            result._block_index = self._block_index
+            result._block_offset = self._block_offset + start_index
+            result._need_refresh_blocks = False
+        return result
 
     @profile
     def append_data_model(self, extra_data):
@@ -174,6 +243,7 @@ class DataFrameAgent:
         self._data = pd.concat([self._data, target_to_be_merged], ignore_index=True, copy = False)
 
         self._need_refresh_rows = True
+        self._need_refresh_blocks = True
         self._need_refresh_columns = True
         self._need_refresh_schema = True
 
@@ -182,22 +252,37 @@ class DataFrameAgent:
     def modify_row(self, row_index, new_row):
         self._data.iloc[row_index] = new_row
         self._need_refresh_rows = True
+        self._need_refresh_blocks = True
         self._need_refresh_columns = True
 
     def modify_column(self, column_name, value):
         self._data[column_name] = value
         self._need_refresh_rows = True
+        self._need_refresh_blocks = True
         self._need_refresh_columns = True
 
     def rename_column(self, columns):
         self._data.rename(columns=columns, inplace=True, copy = False)
         self._need_refresh_schema = True
         self._need_refresh_columns = True
+        self._need_refresh_blocks = True
 
     @profile
     def modify_element(self, row_index, column_name, value):
         self._data.loc[row_index, column_name] = value
         self._need_refresh_rows = True
+        self._need_refresh_blocks = True
+        self._need_refresh_columns = True
+        self._need_refresh_schema = True
+
+    @profile
+    def modify_elements(self, row_indexes, column_name, values):
+        """
+        Same as modify_element(), but for many rows at once; row_indexes can be labels or a boolean mask
+        """
+        self._data.loc[row_indexes, column_name] = values
+        self._need_refresh_rows = True
+        self._need_refresh_blocks = True
         self._need_refresh_columns = True
         self._need_refresh_schema = True
 
@@ -216,7 +301,7 @@ class DataFrameAgent:
         if len(result) == 0:
             return None
         first_index = result[0]
-        return Row(self._row_cache[first_index], self._schema, first_index)
+        return self._row_class(self._row_cache[first_index], self._schema, first_index)
 
     def fillna(self, value):
         self._data.fillna(value, inplace = True)
@@ -264,15 +349,39 @@ class DataFrameAgent:
             self._data = new_data
         return self
 
+    @profile
+    def refresh_block_index(self):
+        if not self._need_refresh_blocks:
+            return
+        self._need_refresh_blocks = False
+        self._block_index = {}
+        self._block_offset = 0
+        if self._data is None or "operation" not in self._data.columns:
+            return
+
+        block_rows = np.where(self._data["operation"].isin(["block_start", "block_end"]).values)[0]
+        block_ids = self._data["stmt_id"].values[block_rows]
+        for i in range(len(block_rows)):
+            block_id = block_ids[i]
+            if block_id in self._block_index:
+                self._block_index[block_id] = (self._block_index[block_id][0], block_rows[i])
+            else:
+                self._block_index[block_id] = (block_rows[i], -1)
+
     @profile
     def search_block_id(self, block_id):
         if util.isna(block_id):
             return None
-        query = (self.stmt_id.values == block_id)
-        block_start_end = np.where(query)[0]
-        if len(block_start_end) < 2:
+        self.refresh_block_index()
+        block_start_end = self._block_index.get(block_id)
+        if block_start_end is None:
+            return None
+
+        start_row = block_start_end[0] - self._block_offset
+        end_row = block_start_end[1] - self._block_offset
+        if start_row < 0 or end_row < start_row or end_row >= len(self):
             return None
-        return block_start_end
+        return (start_row, end_row)
 
     @profile
     def read_block(self, block_id, reset_index = False):
@@ -302,6 +411,8 @@ class DataFrameAgent:
             util.debug(self._row_cache)
 
 class Row:
+    __slots__ = ("_row", "_schema", "_index")
+
     def __init__(self, row, schema, index):
         self._row = row
         self._schema = schema
@@ -322,6 +433,37 @@ class Row:
     def __len__(self):
         return len(self._row)
 
+    def __reduce__(self):
+        # the specialized classes can not be pickled by name
+        return (make_row, (self._row, self._schema, self._index))
+
+# tuple(column names) -> subclass of Row
+ROW_CLASSES = {}
+
+def make_column_property(pos):
+    return property(lambda self: self._row[pos])
+
+def specialize_row_class(schema):
+    """
+    Return a subclass of Row with one property per column, which avoids the failed attribute lookup and the
+    schema search of Row.__getattr__. The columns not in the schema still go to Row.__getattr__.
+    """
+    key = tuple(schema)
+    row_class = ROW_CLASSES.get(key)
+    if row_class is not None:
+        return row_class
+
+    attributes = {"__slots__": ()}
+    for column_name, pos in schema.items():
+        if isinstance(column_name, str) and column_name.isidentifier() and not hasattr(Row, column_name):
+            attributes[column_name] = make_column_property(pos)
+    row_class = type("Row", (Row,), attributes)
+    ROW_CLASSES[key] = row_class
+    return row_class
+
+def make_row(row, schema, index):
+    return specialize_row_class(schema)(row, schema, index)
+
 
 class Column(pd.Series):
     # def __new__(cls, input_array, *args, **kwargs):
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 # system modules
+import contextlib
+import hashlib
+import json
 import os
 import re
 import sys
+import time
 import pandas as pd
 import numpy as np
 import networkx as nx
@@ -12,6 +16,12 @@ import keyword
 from . import dataframe_operation as do
 from lian.config import config
 
+try:
+    import resource
+except ImportError:
+    # not available on Windows, where the peak RSS is not recorded
+    resource = None
+
 @profile
 def is_empty(element):
     if isna(element):
@@ -23,7 +33,7 @@ def is_empty(element):
     return False
 
 def isna(element):
-    if element is None:
+    if element is None or element is pd.NA:
         return True
     return isinstance(element, float) and math.isnan(element)
 
@@ -34,7 +44,7 @@ def is_available(element):
     return not is_empty(element)
 
 def file_md5(filename, chunksize=65536):
-    m = _md5.md5()
+    m = hashlib.md5()
     with open(filename, 'rb') as f:
         while chunk := f.read(chunksize):
             m.update(chunk)
@@ -44,6 +54,135 @@ def error_and_quit(*msg):
     sys.stderr.write(f"[ERROR]: {''.join(msg)}\n")
     sys.exit(-1)
 
+# Filled if config.METRICS_FLAG is on, and saved by save_metrics()
+# phase name -> {"seconds", "calls", "peak_rss_kb"}
+PHASE_METRICS = {}
+# unit_id -> {"path", "lang_seconds", "rows_exported", "scope_hierarchy_seconds", ...}
+UNIT_METRICS = {}
+# method_id -> {"unit_id", "name", "stmts", "<phase name>_seconds", "worklist_iterations", ...}
+METHOD_METRICS = {}
+
+def peak_rss_kb(who = None):
+    if resource is None:
+        return 0
+    if who is None:
+        who = resource.RUSAGE_SELF
+    # KB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(who).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss //= 1024
+    return peak_rss
+
+def add_phase_metrics(phase_name, seconds, calls = 1):
+    if not config.METRICS_FLAG:
+        return
+    metrics = PHASE_METRICS.get(phase_name)
+    if metrics is None:
+        metrics = {"seconds": 0.0, "calls": 0, "peak_rss_kb": 0}
+        PHASE_METRICS[phase_name] = metrics
+    metrics["seconds"] += seconds
+    metrics["calls"] += calls
+    metrics["peak_rss_kb"] = max(metrics["peak_rss_kb"], peak_rss_kb())
+
+def add_record_metrics(table, key, values):
+    """
+    Add the numbers of values to table[key], and set the other values, e.g., the path of a unit
+    """
+    metrics = table.get(key)
+    if metrics is None:
+        metrics = {}
+        table[key] = metrics
+    for name, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = metrics.get(name, 0) + value
+        else:
+            metrics[name] = value
+
+def add_unit_metrics(unit_id, values):
+    if config.METRICS_FLAG:
+        add_record_metrics(UNIT_METRICS, int(unit_id), values)
+
+def add_method_metrics(method_id, values):
+    if config.METRICS_FLAG:
+        add_record_metrics(METHOD_METRICS, int(method_id), values)
+
+@contextlib.contextmanager
+def measure_phase(phase_name):
+    """
+    Add the time spent in the with-block to PHASE_METRICS[phase_name], with the peak RSS of the process so far
+    """
+    if not config.METRICS_FLAG:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_metrics(phase_name, time.perf_counter() - start_time)
+
+def take_metrics():
+    """
+    Return and clear the metrics recorded so far, in a worker process
+    """
+    metrics = (dict(PHASE_METRICS), dict(UNIT_METRICS), dict(METHOD_METRICS))
+    PHASE_METRICS.clear()
+    UNIT_METRICS.clear()
+    METHOD_METRICS.clear()
+    return metrics
+
+def merge_metrics(metrics):
+    """
+    Add the metrics returned by take_metrics() in a worker process
+    """
+    if not config.METRICS_FLAG:
+        return
+    phase_metrics, unit_metrics, method_metrics = metrics
+    for phase_name, values in phase_metrics.items():
+        add_phase_metrics(phase_name, values["seconds"], values["calls"])
+        PHASE_METRICS[phase_name]["peak_rss_kb"] = max(PHASE_METRICS[phase_name]["peak_rss_kb"], values["peak_rss_kb"])
+    for unit_id, values in unit_metrics.items():
+        add_record_metrics(UNIT_METRICS, unit_id, values)
+    for method_id, values in method_metrics.items():
+        add_record_metrics(METHOD_METRICS, method_id, values)
+
+def save_metrics(path, total_seconds):
+    """
+    Write the metrics as JSON, with the units and the methods sorted by time, the slowest first
+    """
+    units = {}
+    for unit_id, values in UNIT_METRICS.items():
+        units[unit_id] = dict(values, unit_id = unit_id, methods = 0, method_seconds = 0.0)
+
+    methods = []
+    for method_id, values in METHOD_METRICS.items():
+        method = dict(values, method_id = method_id)
+        seconds = 0.0
+        for name, value in values.items():
+            if name.endswith("_seconds"):
+                seconds += value
+        method["seconds"] = seconds
+        methods.append(method)
+
+        unit = units.get(method.get("unit_id"))
+        if unit is not None:
+            unit["methods"] += 1
+            unit["method_seconds"] += seconds
+
+    for unit in units.values():
+        unit["seconds"] = (
+            unit.get("lang_seconds", 0.0) + unit.get("scope_hierarchy_seconds", 0.0) + unit["method_seconds"]
+        )
+
+    with open(path, "w") as f:
+        json.dump({
+            "total_seconds": total_seconds,
+            "peak_rss_kb": max(peak_rss_kb(), peak_rss_kb(resource.RUSAGE_CHILDREN) if resource else 0),
+            "phases": PHASE_METRICS,
+            "units": sorted(units.values(), key = lambda unit: unit["seconds"], reverse = True),
+            "methods": sorted(methods, key = lambda method: method["seconds"], reverse = True),
+        }, f, indent = 4)
+
 def error(*msg):
     # logging.error('这是一条debug级别的日志')
     sys.stderr.write(f"[ERROR]: {''.join(msg)}\n")
@@ -173,9 +312,48 @@ class SimpleEnum:
     def __getattr__(self, item):
         return self._members.get(item)
 
+def cfg_reverse_postorder(graph, nodes):
+    """
+    Return {node: order} of the given nodes in the reverse postorder of graph.
+    The DFS starts from the nodes without predecessors, and then from the rest nodes to cover unreachable cycles.
+    """
+    postorder = []
+    visited = set()
+    roots = []
+    for node in nodes:
+        if graph.in_degree(node) == 0:
+            roots.append(node)
+    roots.extend(nodes)
+
+    for root in roots:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(graph.successors(root)))]
+        while stack:
+            node, children = stack[-1]
+            next_child = None
+            for child in children:
+                if child not in visited:
+                    next_child = child
+                    break
+            if next_child is None:
+                stack.pop()
+                postorder.append(node)
+            else:
+                visited.add(next_child)
+                stack.append((next_child, iter(graph.successors(next_child))))
+
+    order = {}
+    counter = 0
+    for node in reversed(postorder):
+        order[node] = counter
+        counter += 1
+    return order
+
 def find_cfg_last_nodes(graph):
     leaf_stmts = set()
-    for stmt in graph.nodes:
+    for stmt in graph.nodes():
         if graph.out_degree(stmt) == 0:
             leaf_stmts.add(stmt)
 